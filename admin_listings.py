@@ -0,0 +1,144 @@
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import contains_eager
+
+from pagination import keyset_page
+
+MAX_PAGE_SIZE = 200
+
+
+def listing_filters(args) -> Dict:
+    """
+    Filters for the hotel and room listings from request arguments; raises
+    ValueError for a malformed one. `name` is a prefix of the hotel name,
+    `min_rating` a lower bound on the hotel rating; the rest match exactly.
+    """
+    from app import ROOM_TYPES
+
+    filters = {}
+    for field in ('city', 'name'):
+        value = (args.get(field) or '').strip()
+        if value:
+            filters[field] = value
+    if args.get('min_rating'):
+        filters['min_rating'] = float(args['min_rating'])
+        if not 0 <= filters['min_rating'] <= 5:
+            raise ValueError('min_rating must be between 0 and 5')
+    if args.get('room_type'):
+        if args['room_type'] not in ROOM_TYPES:
+            raise ValueError(f"room_type must be one of {', '.join(ROOM_TYPES)}")
+        filters['room_type'] = args['room_type']
+    if args.get('hotel_id'):
+        filters['hotel_id'] = int(args['hotel_id'])
+    if args.get('available') in ('true', 'false'):
+        filters['available'] = args['available'] == 'true'
+    elif args.get('available'):
+        raise ValueError('available must be true or false')
+    return filters
+
+
+def page_size(args, default: int) -> int:
+    try:
+        return min(max(int(args.get('per_page', default)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return default
+
+
+def _hotel_conditions(filters: Dict) -> List:
+    from app import Hotel
+
+    conditions = []
+    if 'city' in filters:
+        conditions.append(Hotel.city == filters['city'])
+    if 'name' in filters:
+        conditions.append(Hotel.name.startswith(filters['name'], autoescape=True))
+    if 'min_rating' in filters:
+        conditions.append(Hotel.rating >= filters['min_rating'])
+    return conditions
+
+
+def hotel_page(filters: Dict, cursor: Optional[str] = None, per_page: int = 50) -> Tuple[List, Optional[str]]:
+    """
+    A page of hotels in name order matching `filters`; `room_type` keeps
+    hotels with at least one room of that type. Returns (hotels, next_cursor)
+    as keyset_page does; raises pagination.InvalidCursor for a bad cursor.
+    """
+    from app import db, Hotel, Room
+
+    statement = db.select(Hotel).where(*_hotel_conditions(filters))
+    if 'room_type' in filters:
+        statement = statement.where(db.select(Room.id).where(
+            Room.hotel_id == Hotel.id, Room.type == filters['room_type']).exists())
+    return keyset_page(statement, [Hotel.name, Hotel.id], cursor=cursor, per_page=per_page)
+
+
+def room_page(filters: Dict, cursor: Optional[str] = None, per_page: int = 50) -> Tuple[List, Optional[str]]:
+    """
+    A page of rooms ordered by hotel, matching `filters`. City, name prefix
+    and rating filter on the room's hotel. Rooms come with their hotel loaded.
+    """
+    from app import db, Room
+
+    statement = db.select(Room).join(Room.hotel).options(contains_eager(Room.hotel)).where(
+        *_hotel_conditions(filters))
+    if 'hotel_id' in filters:
+        statement = statement.where(Room.hotel_id == filters['hotel_id'])
+    if 'room_type' in filters:
+        statement = statement.where(Room.type == filters['room_type'])
+    if 'available' in filters:
+        statement = statement.where(Room.available.is_(filters['available']))
+    return keyset_page(statement, [Room.hotel_id, Room.id], cursor=cursor, per_page=per_page)
+
+
+def room_type_counts(hotel_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+    """{hotel_id: {room type: rooms}} for a page of hotels, from one grouped query."""
+    from app import db, Room
+
+    hotel_ids = list(hotel_ids)
+    counts = {hotel_id: {} for hotel_id in hotel_ids}
+    if hotel_ids:
+        for hotel_id, room_type, rooms in db.session.execute(
+                db.select(Room.hotel_id, Room.type, db.func.count(Room.id)).where(
+                    Room.hotel_id.in_(hotel_ids)).group_by(Room.hotel_id, Room.type)):
+            counts[hotel_id][room_type] = rooms
+    return counts
+
+
+def hotel_json(hotel, type_counts: Dict[str, int]) -> Dict:
+    from app import ROOM_TYPES
+
+    return {
+        'id': hotel.id,
+        'name': hotel.name,
+        'city': hotel.city,
+        'address': hotel.address,
+        'rating': hotel.rating,
+        'rooms': sum(type_counts.values()),
+        'room_types': {room_type: type_counts.get(room_type, 0) for room_type in ROOM_TYPES}
+    }
+
+
+def _amenities(value) -> List[str]:
+    # init_db() stores amenities as JSON-encoded strings inside the JSON column
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return [value]
+    return list(value or [])
+
+
+def room_json(room) -> Dict:
+    return {
+        'id': room.id,
+        'hotel_id': room.hotel_id,
+        'hotel': room.hotel.name,
+        'city': room.hotel.city,
+        'type': room.type,
+        'capacity': room.capacity,
+        'price': room.price,
+        'peak_price': room.peak_price,
+        'available': room.available,
+        'amenities': _amenities(room.amenities)
+    }
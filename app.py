@@ -1,60 +1,177 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
-from functools import wraps, lru_cache
+from functools import wraps
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, EmailField, DateField, SelectField, IntegerField, TextAreaField, FloatField, BooleanField, SubmitField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, NumberRange, Optional
 import json
 import os
-import requests
 from itertools import groupby
 import uuid
+import tempfile
 import enum
-from sqlalchemy import extract, create_engine, text
+import click
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 from flask_migrate import Migrate
+from search import search_hotels
+from inventory import sync_booking_nights, is_room_free, backfill_ledger, check_ledger
+from availability_index import AvailabilityIndex
+from search_cache import SearchCache
+from pricing import stay_price, price_many, advance_booking_discount, cancellation_charge
+from price_calendar import refresh_room_calendar, refresh_calendar, stay_totals
+from exchange_rates import RateProvider, currency_symbol
+from pagination import keyset_page, InvalidCursor
+from revenue_rollup import RevenueRollup
+from sales_reports import build_sales_reports
+from booking_export import EXPORT_HEADERS, export_rows, iter_csv, write_xlsx
+from performance import hotel_performance, performance_rows
+from dashboard_stats import DashboardStats, room_counts
+from revenue_series import BUCKETS, GROUPS, MAX_BUCKETS, RevenueSeries, bucket_count
+from bulk_import import KINDS as IMPORT_KINDS, file_format, import_file
+from admin_listings import listing_filters, page_size, hotel_page, room_page, room_type_counts, hotel_json, room_json
+from db_pool import PoolMetrics, as_bool, create_database_on_first_connect, engine_options
+from read_replicas import ReadReplicas, RoutingSession, replica_reads
+from query_stats import QueryStats
+from request_metrics import RequestMetrics
+from request_profiler import RequestProfiler
+from prometheus_client import CONTENT_TYPE_LATEST
 from dotenv import load_dotenv
+import sys
 
 from urllib.parse import quote_plus
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
-
-# Configure MySQL connection
-from urllib.parse import quote_plus
-password = quote_plus(os.getenv('MYSQL_PASSWORD'))
-
-# Create database URL without database name
-base_url = f"mysql+pymysql://{os.getenv('MYSQL_USER')}:{password}@{os.getenv('MYSQL_HOST')}"
-database_name = os.getenv('MYSQL_DATABASE')
-
-# Create engine without database selected
-engine = create_engine(base_url)
+# Helper modules import models lazily via `from app import ...`; make that
+# resolve to this module when it is run directly as a script.
+if __name__ == '__main__':
+    sys.modules.setdefault('app', sys.modules[__name__])
 
-# Create database if it doesn't exist
-with engine.connect() as conn:
-    conn.execute(text(f"CREATE DATABASE IF NOT EXISTS {database_name}"))
-    conn.execute(text(f"USE {database_name}"))
+# Extensions are created unbound and attached to the app in create_app()
+# Reads of @replica_reads views may be routed to a replica by the session
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+migrate = Migrate()
+login_manager = LoginManager()
+login_manager.login_view = 'login'
+availability = AvailabilityIndex()
+search_cache = SearchCache()
+rate_provider = RateProvider()
+revenue_rollup = RevenueRollup()
+dashboard_stats = DashboardStats()
+revenue_series = RevenueSeries()
+pool_metrics = PoolMetrics()
+read_replicas = ReadReplicas()
+query_stats = QueryStats()
+request_metrics = RequestMetrics()
+request_profiler = RequestProfiler()
+
+
+def mysql_url():
+    password = quote_plus(os.getenv('MYSQL_PASSWORD', ''))
+    return (f"mysql+pymysql://{os.getenv('MYSQL_USER')}:{password}@{os.getenv('MYSQL_HOST')}"
+            f"/{os.getenv('MYSQL_DATABASE')}?charset=utf8mb4")
+
+
+def create_app(config=None):
+    """
+    Build the application from the environment, with `config` overriding it.
+    Nothing here touches the database: the engine and its pool are created
+    on first use and MySQL's CREATE DATABASE runs just before the first
+    connection, so importing the app costs no round trips. DATABASE_URL
+    replaces the MYSQL_* settings, e.g. sqlite:///hotel.db for local work.
+
+    The models, routes and commands below are registered on the one app this
+    module builds, so call it once per process (app.py does).
+    """
+    app = Flask(__name__)
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or mysql_url()
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    app.config['DB_POOL_PRE_PING'] = os.environ.get('DB_POOL_PRE_PING', 'on')
+    app.config['DB_CREATE_DATABASE'] = os.environ.get('DB_CREATE_DATABASE', 'on')
+    app.config['DB_REPLICA_URLS'] = os.environ.get('DB_REPLICA_URLS', '')
+    app.config['DB_REPLICA_CHECK_INTERVAL'] = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 10))
+    app.config['DB_REPLICA_STICKY_SECONDS'] = float(os.environ.get('DB_REPLICA_STICKY_SECONDS', 30))
+    app.config['QUERY_STATS'] = os.environ.get('QUERY_STATS', 'on')
+    app.config['QUERY_STATS_HEADERS'] = os.environ.get('QUERY_STATS_HEADERS')
+    app.config['QUERY_STATS_SLOWEST'] = int(os.environ.get('QUERY_STATS_SLOWEST', 5))
+    app.config['QUERY_STATS_REPEAT_THRESHOLD'] = int(os.environ.get('QUERY_STATS_REPEAT_THRESHOLD', 5))
+    app.config['PROFILER_DIR'] = os.environ.get('PROFILER_DIR', os.path.join(app.instance_path, 'profiles'))
+    app.config['PROFILER_SAMPLE_RATE'] = float(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+    app.config['PROFILER_INTERVAL'] = float(os.environ.get('PROFILER_INTERVAL', 0.005))
+    app.config['PROFILER_KEEP'] = int(os.environ.get('PROFILER_KEEP', 100))
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
+    app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
+    app.config['AVAILABILITY_INDEX'] = os.environ.get('AVAILABILITY_INDEX', 'on')
+    app.config['AVAILABILITY_INDEX_MAX_AGE'] = int(os.environ.get('AVAILABILITY_INDEX_MAX_AGE', 60))
+    app.config['SEARCH_CACHE_REDIS_URL'] = os.environ.get('SEARCH_CACHE_REDIS_URL')
+    app.config['SEARCH_CACHE_TYPE'] = os.environ.get(
+        'SEARCH_CACHE_TYPE', 'RedisCache' if app.config['SEARCH_CACHE_REDIS_URL'] else 'FileSystemCache')
+    app.config['SEARCH_CACHE_DIR'] = os.environ.get(
+        'SEARCH_CACHE_DIR', os.path.join(app.instance_path, 'search_cache'))
+    app.config['SEARCH_CACHE_TIMEOUT'] = int(os.environ.get('SEARCH_CACHE_TIMEOUT', 300))
+    app.config['SEARCH_CACHE_THRESHOLD'] = int(os.environ.get('SEARCH_CACHE_THRESHOLD', 1000))
+    app.config['EXCHANGE_RATE_URL'] = os.environ.get('EXCHANGE_RATE_URL', 'https://api.exchangerate-api.com/v4/latest/GBP')
+    app.config['EXCHANGE_RATE_TIMEOUT'] = float(os.environ.get('EXCHANGE_RATE_TIMEOUT', 5))
+    app.config['EXCHANGE_RATE_REFRESH_SECONDS'] = int(os.environ.get('EXCHANGE_RATE_REFRESH_SECONDS', 3600))
+    app.config['EXCHANGE_RATE_SNAPSHOT_PATH'] = os.environ.get(
+        'EXCHANGE_RATE_SNAPSHOT_PATH', os.path.join(app.instance_path, 'exchange_rates.json'))
+    app.config['PROFILE_PAGE_SIZE'] = int(os.environ.get('PROFILE_PAGE_SIZE', 20))
+    app.config['ADMIN_PAGE_SIZE'] = int(os.environ.get('ADMIN_PAGE_SIZE', 50))
+    app.config['DASHBOARD_CACHE_REDIS_URL'] = os.environ.get('DASHBOARD_CACHE_REDIS_URL')
+    app.config['DASHBOARD_CACHE_TYPE'] = os.environ.get(
+        'DASHBOARD_CACHE_TYPE', 'RedisCache' if app.config['DASHBOARD_CACHE_REDIS_URL'] else 'FileSystemCache')
+    app.config['DASHBOARD_CACHE_DIR'] = os.environ.get(
+        'DASHBOARD_CACHE_DIR', os.path.join(app.instance_path, 'dashboard_cache'))
+    app.config['DASHBOARD_CACHE_TIMEOUT'] = int(os.environ.get('DASHBOARD_CACHE_TIMEOUT', 30))
+    app.config['REPORT_CACHE_REDIS_URL'] = os.environ.get('REPORT_CACHE_REDIS_URL')
+    app.config['REPORT_CACHE_TYPE'] = os.environ.get(
+        'REPORT_CACHE_TYPE', 'RedisCache' if app.config['REPORT_CACHE_REDIS_URL'] else 'FileSystemCache')
+    app.config['REPORT_CACHE_DIR'] = os.environ.get(
+        'REPORT_CACHE_DIR', os.path.join(app.instance_path, 'report_cache'))
+    app.config['REPORT_CACHE_TIMEOUT'] = int(os.environ.get('REPORT_CACHE_TIMEOUT', 300))
+
+    if config:
+        app.config.update(config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config, pool_metrics))
+
+    # Ensure the upload folder exists
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+    login_manager.init_app(app)
+    availability.init_app(app, db)
+    search_cache.init_app(app)
+    rate_provider.init_app(app)
+    revenue_rollup.init_app(app, db)
+    dashboard_stats.init_app(app)
+    revenue_series.init_app(app, revenue_rollup)
+    pool_metrics.init_app(app)
+    read_replicas.init_app(app, db, pool_metrics)
+    query_stats.init_app(app)
+    request_metrics.init_app(app)
+    request_profiler.init_app(app)
+
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'mysql' and as_bool(app.config['DB_CREATE_DATABASE']):
+        with app.app_context():
+            create_database_on_first_connect(db.engine, url.database)
 
-# Now configure Flask-SQLAlchemy with the full database URL
-app.config['SQLALCHEMY_DATABASE_URI'] = f"{base_url}/{database_name}?charset=utf8mb4"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
-app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'uploads')
+    return app
 
-# Ensure the upload folder exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# Initialize extensions
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+app = create_app()
 
 # Enums
 class RoomType(enum.Enum):
@@ -130,8 +247,12 @@ class HotelForm(FlaskForm):
     rating = FloatField('Rating', validators=[NumberRange(min=0, max=5)])
     submit = SubmitField('Submit')
 
+ROOM_TYPE_CHOICES = [('standard', 'Standard'), ('double', 'Double'), ('family', 'Family')]
+# The room types an admin can pick, also accepted by the bulk import and listing filters
+ROOM_TYPES = tuple(value for value, _ in ROOM_TYPE_CHOICES)
+
 class RoomForm(FlaskForm):
-    type = SelectField('Room Type', choices=[('standard', 'Standard'), ('double', 'Double'), ('family', 'Family')])
+    type = SelectField('Room Type', choices=ROOM_TYPE_CHOICES)
     description = TextAreaField('Description')
     base_price = FloatField('Base Price', validators=[DataRequired(), NumberRange(min=0)])
     max_guests = IntegerField('Max Guests', validators=[DataRequired(), NumberRange(min=1)])
@@ -215,6 +336,12 @@ class User(UserMixin, db.Model):
 
 class Hotel(db.Model):
     __tablename__ = 'hotels'
+    __table_args__ = (
+        # Admin listings: ORDER BY name, id, optionally WHERE name LIKE 'prefix%'
+        db.Index('ix_hotels_name', 'name'),
+        # ... or WHERE city = ? ORDER BY name, id
+        db.Index('ix_hotels_city_name', 'city', 'name'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     city = db.Column(db.String(50), nullable=False)
@@ -229,6 +356,10 @@ class Hotel(db.Model):
 
 class Room(db.Model):
     __tablename__ = 'rooms'
+    __table_args__ = (
+        # Room listings and room-type filters: hotel_id = ? [AND type = ?]
+        db.Index('ix_rooms_hotel_type', 'hotel_id', 'type'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     hotel_id = db.Column(db.Integer, db.ForeignKey('hotels.id'), nullable=False)
     type = db.Column(db.String(50), nullable=False)
@@ -244,37 +375,20 @@ class Room(db.Model):
     bookings = db.relationship('Booking', backref='room', lazy=True)
 
     def calculate_price(self, check_in, check_out):
-        if isinstance(check_in, str):
-            check_in = datetime.strptime(check_in, '%Y-%m-%d').date()
-        if isinstance(check_out, str):
-            check_out = datetime.strptime(check_out, '%Y-%m-%d').date()
-        
-        nights = (check_out - check_in).days
-        if nights <= 0:
-            return None
-        
-        total_price = 0
-        current_date = check_in
-        
-        while current_date < check_out:
-            is_weekend = current_date.weekday() >= 5
-            is_peak = current_date.month in [4, 5, 6, 7, 8, 11, 12]
-            
-            if is_peak:
-                day_price = self.peak_price or (self.base_price * 1.3)
-            else:
-                day_price = self.base_price
-            
-            if is_weekend:
-                day_price *= 1.2
-            
-            total_price += day_price
-            current_date += timedelta(days=1)
-        
-        return total_price
+        return stay_price(self.base_price, self.peak_price, check_in, check_out)
 
 class Booking(db.Model):
     __tablename__ = 'bookings'
+    __table_args__ = (
+        # Occupancy and hotel performance: hotel_id IN (...) AND status IN (...) [AND booking_date BETWEEN ...]
+        db.Index('ix_bookings_hotel_status', 'hotel_id', 'status', 'booking_date'),
+        # Profile pages: user_id = ? AND check_in >= ? ORDER BY check_in, id
+        db.Index('ix_bookings_user_check_in', 'user_id', 'check_in'),
+        # Booking export: booking_date >= ? AND booking_date < ?
+        db.Index('ix_bookings_booking_date', 'booking_date'),
+        # Dashboard recent bookings: ORDER BY created_at DESC LIMIT ?
+        db.Index('ix_bookings_created_at', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     booking_id = db.Column(db.String(50), unique=True, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -296,8 +410,45 @@ class Booking(db.Model):
         if not self.booking_id:
             self.booking_id = str(uuid.uuid4())
 
+class RoomNight(db.Model):
+    """One row per room per night held by an active booking."""
+    __tablename__ = 'room_nights'
+    room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), primary_key=True)
+    night = db.Column(db.Date, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('bookings.id'), nullable=False, index=True)
+
+class RoomPriceNight(db.Model):
+    """Precomputed nightly price per room over the booking window."""
+    __tablename__ = 'room_price_calendar'
+    room_id = db.Column(db.Integer, db.ForeignKey('rooms.id'), primary_key=True)
+    night = db.Column(db.Date, primary_key=True)
+    price = db.Column(db.Float, nullable=False)
+    # Running total of this room's calendar prices for the nights before `night`
+    cumulative = db.Column(db.Float, nullable=False)
+
+class RevenueDaily(db.Model):
+    """Bookings and revenue per hotel, day booked, status and room type; maintained by RevenueRollup."""
+    __tablename__ = 'revenue_daily'
+    hotel_id = db.Column(db.Integer, db.ForeignKey('hotels.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    room_type = db.Column(db.String(50), primary_key=True, default='')
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+class CustomerRevenue(db.Model):
+    """Bookings and revenue per user and status; maintained by RevenueRollup."""
+    __tablename__ = 'customer_revenue'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
 class SalesReport(db.Model):
     __tablename__ = 'sales_reports'
+    __table_args__ = (
+        db.Index('uq_sales_reports_hotel_month', 'hotel_id', 'month', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     hotel_id = db.Column(db.Integer, db.ForeignKey('hotels.id'), nullable=False)
     month = db.Column(db.Date, nullable=False)
@@ -308,25 +459,10 @@ class SalesReport(db.Model):
 
     @classmethod
     def generate_monthly_report(cls, hotel_id, month):
-        bookings = Booking.query.filter(
-            Booking.hotel_id == hotel_id,
-            extract('year', Booking.created_at) == month.year,
-            extract('month', Booking.created_at) == month.month,
-            Booking.status == 'confirmed'
-        ).all()
-
-        total_sales = sum(b.total_price for b in bookings)
-        total_bookings = len(bookings)
-        profit = total_sales * 0.2  # Assuming 20% profit margin
-
-        report = cls(
-            hotel_id=hotel_id,
-            month=month,
-            total_sales=total_sales,
-            total_bookings=total_bookings,
-            profit=profit
-        )
-        return report
+        """Materialize (or refresh) one hotel-month report and return it; commit is left to the caller."""
+        month = month.replace(day=1)
+        build_sales_reports(month, month, [hotel_id], connection=db.session.connection())
+        return cls.query.filter_by(hotel_id=hotel_id, month=month).one()
 
 class Currency(db.Model):
     __tablename__ = 'currencies'
@@ -347,14 +483,6 @@ def load_user(user_id):
         return user
     return None
 
-def is_peak_season(date):
-    """
-    Check if a given date falls in peak season.
-    Peak season is April-August and November-December
-    """
-    month = date.month
-    return month in [4, 5, 6, 7, 8, 11, 12]
-
 def calculate_price(room, check_in, check_out):
     """
     Calculate the total price for a room booking based on season
@@ -363,45 +491,30 @@ def calculate_price(room, check_in, check_out):
         if not room or not check_in or not check_out:
             return None
 
-        # Convert dates to datetime if they're date objects
-        if isinstance(check_in, datetime.date):
-            check_in = datetime.combine(check_in, datetime.min.time())
-        if isinstance(check_out, datetime.date):
-            check_out = datetime.combine(check_out, datetime.min.time())
-
         return room.calculate_price(check_in, check_out)
 
     except Exception as e:
         app.logger.error(f"Error calculating price: {str(e)}")
         return None
 
-@lru_cache(maxsize=1)
 def get_exchange_rates():
-    try:
-        response = requests.get('https://api.exchangerate-api.com/v4/latest/GBP')
-        return response.json()['rates']
-    except:
-        # Fallback rates if API fails
-        return {
-            'GBP': 1.0,
-            'EUR': 1.16,
-            'USD': 1.27
-        }
+    return rate_provider.rates()
 
 def convert_currency(amount, from_currency='GBP', to_currency='GBP'):
-    if amount is None:
-        return None
-    
-    rates = get_exchange_rates()
-    if from_currency == to_currency:
-        return amount
-    
-    # Convert to GBP first if not already in GBP
-    if from_currency != 'GBP':
-        amount = amount / rates[from_currency]
-    
-    # Convert from GBP to target currency
-    return amount * rates[to_currency]
+    return rate_provider.convert_many([amount], to_currency, from_currency)[0]
+
+def convert_prices(amounts, to_currency):
+    """Convert a list of GBP amounts to `to_currency` in one pass, rounded for display."""
+    return rate_provider.convert_many(amounts, to_currency)
+
+def display_currency():
+    """Currency picked on the last search, if we have a rate for it."""
+    currency = session.get('currency', 'GBP')
+    return currency if currency in get_exchange_rates() else 'GBP'
+
+@app.context_processor
+def inject_currency():
+    return {'currency_symbol': currency_symbol}
 
 @app.template_filter('unique')
 def unique_filter(items, attribute=None):
@@ -422,6 +535,7 @@ def admin_required(f):
 
 # Routes
 @app.route('/', methods=['GET', 'POST'])
+@replica_reads
 def index():
     form = SearchForm()
     hotels = []
@@ -446,56 +560,32 @@ def index():
             # Store search parameters in session
             session['check_in'] = check_in_str
             session['check_out'] = check_out_str
-            
-            # Filter hotels by city if provided
-            if city:
-                hotels = Hotel.query.filter(Hotel.city == city).all()
-                app.logger.info(f"Found {len(hotels)} hotels in {city}")
-            else:
-                hotels = Hotel.query.all()
-                app.logger.info(f"No city specified. Found {len(hotels)} total hotels")
-            
-            if not hotels:
-                flash('No hotels found in the selected city', 'info')
-                return render_template('index.html', form=form, hotels=[])
+            session['currency'] = selected_currency
             
             # Filter hotels based on room availability
-            if check_in and check_out and rooms_needed:
-                available_hotels = []
-                for hotel in hotels:
-                    rooms_query = Room.query.filter_by(hotel_id=hotel.id, available=True)
-                    
-                    if room_type != 'any':
-                        rooms_query = rooms_query.filter_by(type=room_type)
-                    
-                    available_rooms = rooms_query.all()
-                    app.logger.info(f"Hotel {hotel.name} has {len(available_rooms)} available rooms")
-                    
-                    # Check if hotel has enough rooms
-                    if len(available_rooms) >= rooms_needed:
-                        # Calculate minimum price for available rooms
-                        room_prices = []
-                        for room in available_rooms:
-                            base_price = room.base_price
-                            if is_peak_season(check_in):
-                                price = room.peak_price
-                            else:
-                                price = base_price
-                            room_prices.append(price)
-                        
-                        if room_prices:
-                            min_price = min(room_prices)
-                            if selected_currency != 'GBP':
-                                min_price = convert_currency(min_price, 'GBP', selected_currency)
-                            hotel.min_price = min_price
-                            available_hotels.append(hotel)
-                            app.logger.info(f"Added hotel {hotel.name} to available hotels. Min price: {min_price}")
-                
-                hotels = available_hotels
-                app.logger.info(f"Final number of available hotels: {len(hotels)}")
+            if check_in and check_out and check_out <= check_in:
+                flash('Check-out date must be after check-in date', 'error')
+            elif check_in and check_out and rooms_needed:
+                results = search_cache.get_or_search(
+                    city, check_in, check_out, room_type, rooms_needed,
+                    lambda: search_hotels(city, check_in, check_out, room_type, rooms_needed)
+                )
+                prices = convert_prices([result.min_price for result in results], selected_currency)
+                hotels = [result._replace(min_price=price) for result, price in zip(results, prices)]
+                app.logger.info(f"Found {len(hotels)} hotels with {rooms_needed} free rooms in {city or 'any city'}")
                 
                 if not hotels:
                     flash('No hotels found with available rooms matching your criteria', 'info')
+            else:
+                # Filter hotels by city if provided
+                if city:
+                    hotels = Hotel.query.filter(Hotel.city == city).all()
+                else:
+                    hotels = Hotel.query.all()
+                app.logger.info(f"Found {len(hotels)} hotels in {city or 'any city'}")
+                
+                if not hotels:
+                    flash('No hotels found in the selected city', 'info')
             
         except Exception as e:
             app.logger.error(f"Error in search: {str(e)}")
@@ -519,6 +609,7 @@ def index():
     return render_template('index.html', form=form, hotels=hotels)
 
 @app.route('/hotel/<int:hotel_id>')
+@replica_reads
 def hotel_details(hotel_id):
     try:
         hotel = Hotel.query.get_or_404(hotel_id)
@@ -533,27 +624,43 @@ def hotel_details(hotel_id):
         app.logger.info(f"Found {len(available_rooms)} available rooms for hotel {hotel_id}")
         
         # Get room prices
+        try:
+            # Use today and tomorrow as default dates if not in session
+            check_in = session.get('check_in', datetime.now().date())
+            check_out = session.get('check_out', (datetime.now() + timedelta(days=1)).date())
+            
+            if isinstance(check_in, str):
+                check_in = datetime.strptime(check_in, '%Y-%m-%d').date()
+            if isinstance(check_out, str):
+                check_out = datetime.strptime(check_out, '%Y-%m-%d').date()
+            
+            totals = stay_totals([room.id for room in available_rooms], check_in, check_out)
+            # Stays outside the calendar window are priced directly
+            uncovered = [room for room in available_rooms if room.id not in totals]
+            for room, calculated_price in zip(uncovered, price_many((room, check_in, check_out) for room in uncovered)):
+                totals[room.id] = calculated_price
+        except Exception as e:
+            app.logger.error(f"Error calculating room prices for hotel {hotel_id}: {str(e)}")
+            totals = {}
+        
+        # Convert stay and peak prices for every room in one pass
+        currency = display_currency()
+        gbp_prices = []
         for room in available_rooms:
-            try:
-                # Use today and tomorrow as default dates if not in session
-                check_in = session.get('check_in', datetime.now().date())
-                check_out = session.get('check_out', (datetime.now() + timedelta(days=1)).date())
-                
-                if isinstance(check_in, str):
-                    check_in = datetime.strptime(check_in, '%Y-%m-%d').date()
-                if isinstance(check_out, str):
-                    check_out = datetime.strptime(check_out, '%Y-%m-%d').date()
-                
-                calculated_price = room.calculate_price(check_in, check_out)
-                room.price = calculated_price if calculated_price is not None else room.base_price
-                app.logger.info(f"Calculated price for room {room.id}: {room.price}")
-            except Exception as e:
-                app.logger.error(f"Error calculating price for room {room.id}: {str(e)}")
-                room.price = room.base_price  # Fallback to base price
+            calculated_price = totals.get(room.id)
+            gbp_prices.append(calculated_price if calculated_price is not None else room.base_price)  # Fallback to base price
+            gbp_prices.append(room.peak_price)
+        converted = convert_prices(gbp_prices, currency)
+        room_prices = {
+            room.id: {'price': converted[2 * i], 'peak_price': converted[2 * i + 1]}
+            for i, room in enumerate(available_rooms)
+        }
         
         return render_template('hotel_details.html', 
                              hotel=hotel, 
-                             available_rooms=available_rooms)
+                             available_rooms=available_rooms,
+                             room_prices=room_prices,
+                             currency=currency)
     
     except Exception as e:
         app.logger.error(f"Error loading hotel details for hotel {hotel_id}: {str(e)}")
@@ -606,16 +713,10 @@ def booking(hotel_id, room_id):
                     flash('Maximum booking duration is 30 days', 'error')
                     return render_template('booking.html', form=form, hotel=hotel, room=room)
                 
-                # Check if room is available for these dates
-                existing_bookings = Booking.query.filter(
-                    Booking.room_id == room_id,
-                    Booking.status.in_(['confirmed', 'pending']),
-                    Booking.payment_status != 'cancelled',
-                    Booking.check_out > datetime.combine(check_in, datetime.min.time()),
-                    Booking.check_in < datetime.combine(check_out, datetime.min.time())
-                ).first()
-                
-                if existing_bookings:
+                # Check if room is available for these dates. Asks the ledger rather
+                # than the availability index, which may not have seen another
+                # worker's booking yet
+                if not is_room_free(room_id, check_in, check_out):
                     flash('Room is not available for the selected dates', 'error')
                     return render_template('booking.html', form=form, hotel=hotel, room=room)
                 
@@ -635,13 +736,7 @@ def booking(hotel_id, room_id):
                     return render_template('booking.html', form=form, hotel=hotel, room=room)
                 
                 # Apply advance booking discount
-                days_until_checkin = (check_in - datetime.now().date()).days
-                if days_until_checkin > 60:
-                    discount = 0.15  # 15% discount
-                elif days_until_checkin > 30:
-                    discount = 0.10  # 10% discount
-                else:
-                    discount = 0
+                discount, _ = advance_booking_discount(check_in)
                 
                 discounted_price = total_price * (1 - discount)
                 
@@ -660,7 +755,10 @@ def booking(hotel_id, room_id):
                 )
                 
                 db.session.add(booking)
+                db.session.flush()
+                sync_booking_nights(booking)
                 db.session.commit()
+                search_cache.invalidate_booking(booking)
                 
                 # Store booking dates in session
                 session['check_in'] = check_in.strftime('%Y-%m-%d')
@@ -669,6 +767,11 @@ def booking(hotel_id, room_id):
                 flash('Booking created successfully. Please complete the payment.', 'success')
                 return redirect(url_for('payment', booking_id=booking.id))
                 
+            except IntegrityError:
+                # A concurrent booking took one of these nights after the check above
+                db.session.rollback()
+                flash('Room is not available for the selected dates', 'error')
+                return render_template('booking.html', form=form, hotel=hotel, room=room)
             except Exception as e:
                 db.session.rollback()
                 app.logger.error(f"Error processing booking: {str(e)}")
@@ -711,17 +814,21 @@ def payment(booking_id):
         if (datetime.utcnow() - booking.created_at).total_seconds() > 1800:  # 30 minutes
             booking.status = 'cancelled'
             booking.payment_status = 'cancelled'
+            sync_booking_nights(booking)
             db.session.commit()
+            search_cache.invalidate_booking(booking)
             flash('Booking expired. Please try again.', 'error')
             return redirect(url_for('hotel_details', hotel_id=booking.hotel_id))
         
         form = PaymentForm()
+        currency = display_currency()
+        display_total, = convert_prices([booking.total_price], currency)
         
         if form.validate_on_submit():
             try:
                 if not form.confirm_payment.data:
                     flash('Please confirm that you want to proceed with the payment', 'error')
-                    return render_template('payment.html', form=form, booking=booking)
+                    return render_template('payment.html', form=form, booking=booking, currency=currency, display_total=display_total)
                 
                 payment_method = form.payment_method.data
                 
@@ -731,38 +838,38 @@ def payment(booking_id):
                     card_number = form.card_number.data.strip()
                     if not card_number.isdigit() or len(card_number) != 16:
                         flash('Invalid card number', 'error')
-                        return render_template('payment.html', form=form, booking=booking)
+                        return render_template('payment.html', form=form, booking=booking, currency=currency, display_total=display_total)
                     
                     cvv = form.cvv.data.strip()
                     if not cvv.isdigit() or len(cvv) not in [3, 4]:
                         flash('Invalid CVV', 'error')
-                        return render_template('payment.html', form=form, booking=booking)
+                        return render_template('payment.html', form=form, booking=booking, currency=currency, display_total=display_total)
                         
                     if not form.card_holder.data or len(form.card_holder.data.strip()) < 2:
                         flash('Please enter a valid card holder name', 'error')
-                        return render_template('payment.html', form=form, booking=booking)
+                        return render_template('payment.html', form=form, booking=booking, currency=currency, display_total=display_total)
                         
                     if not form.expiry_month.data or not form.expiry_year.data:
                         flash('Please select card expiry date', 'error')
-                        return render_template('payment.html', form=form, booking=booking)
+                        return render_template('payment.html', form=form, booking=booking, currency=currency, display_total=display_total)
                         
                     # Check if card is expired
                     expiry_date = datetime(int(form.expiry_year.data), int(form.expiry_month.data), 1)
                     if expiry_date.date() < datetime.now().date():
                         flash('Card has expired', 'error')
-                        return render_template('payment.html', form=form, booking=booking)
+                        return render_template('payment.html', form=form, booking=booking, currency=currency, display_total=display_total)
                         
                 elif payment_method == 'paypal':
                     # Validate PayPal email
                     if not form.paypal_email.data or '@' not in form.paypal_email.data:
                         flash('Please enter a valid PayPal email address', 'error')
-                        return render_template('payment.html', form=form, booking=booking)
+                        return render_template('payment.html', form=form, booking=booking, currency=currency, display_total=display_total)
                         
                 elif payment_method == 'googlepay':
                     # Validate Google Pay account
                     if not form.google_account.data or '@' not in form.google_account.data:
                         flash('Please enter a valid Google account email', 'error')
-                        return render_template('payment.html', form=form, booking=booking)
+                        return render_template('payment.html', form=form, booking=booking, currency=currency, display_total=display_total)
                 
                 # In a real application, you would process the payment here based on the payment method
                 # For this demo, we'll just mark the booking as paid
@@ -771,12 +878,11 @@ def payment(booking_id):
                 booking.booking_date = datetime.utcnow()
                 booking.payment_method = payment_method
                 
-                # Mark the room as unavailable for these dates
-                room = Room.query.get(booking.room_id)
-                if room:
-                    room.available = False
+                # Hold the room for these dates
+                sync_booking_nights(booking)
                 
                 db.session.commit()
+                search_cache.invalidate_booking(booking)
                 
                 # Clear session data
                 session.pop('check_in', None)
@@ -789,11 +895,13 @@ def payment(booking_id):
                 db.session.rollback()
                 app.logger.error(f"Error processing payment: {str(e)}")
                 flash('An error occurred while processing your payment. Please try again.', 'error')
-                return render_template('payment.html', form=form, booking=booking)
+                return render_template('payment.html', form=form, booking=booking, currency=currency, display_total=display_total)
         
         return render_template('payment.html', 
                              form=form, 
-                             booking=booking)
+                             booking=booking,
+                             currency=currency,
+                             display_total=display_total)
                              
     except Exception as e:
         app.logger.error(f"Error in payment route: {str(e)}")
@@ -840,21 +948,58 @@ def logout():
 
 @app.route('/profile')
 @login_required
+@replica_reads
 def profile():
-    now = datetime.utcnow()
-    upcoming_bookings = Booking.query.filter(
-        Booking.user_id == current_user.id,
-        Booking.check_in >= now
-    ).order_by(Booking.check_in).all()
-    
-    past_bookings = Booking.query.filter(
-        Booking.user_id == current_user.id,
-        Booking.check_in < now
-    ).order_by(Booking.check_in.desc()).all()
+    per_page = app.config['PROFILE_PAGE_SIZE']
+    upcoming_bookings, upcoming_cursor = profile_bookings_page('upcoming', per_page=per_page)
+    past_bookings, past_cursor = profile_bookings_page('past', per_page=per_page)
     
     return render_template('profile.html',
                          upcoming_bookings=upcoming_bookings,
-                         past_bookings=past_bookings)
+                         upcoming_cursor=upcoming_cursor,
+                         past_bookings=past_bookings,
+                         past_cursor=past_cursor)
+
+def profile_bookings_page(section, cursor=None, per_page=20):
+    """A page of the current user's upcoming (soonest first) or past (latest first) bookings."""
+    now = datetime.utcnow()
+    statement = db.select(Booking).where(Booking.user_id == current_user.id).options(
+        joinedload(Booking.hotel), joinedload(Booking.room))
+    if section == 'upcoming':
+        statement = statement.where(Booking.check_in >= now)
+    else:
+        statement = statement.where(Booking.check_in < now)
+    return keyset_page(statement, [Booking.check_in, Booking.id], cursor=cursor,
+                       per_page=per_page, descending=section == 'past')
+
+@app.route('/api/profile/bookings')
+@login_required
+@replica_reads
+def profile_bookings():
+    section = request.args.get('section', 'upcoming')
+    if section not in ('upcoming', 'past'):
+        return jsonify({'error': 'section must be upcoming or past'}), 400
+    try:
+        bookings, next_cursor = profile_bookings_page(section, request.args.get('cursor'),
+                                                      per_page=app.config['PROFILE_PAGE_SIZE'])
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    return jsonify({
+        'bookings': [{
+            'id': booking.id,
+            'booking_id': booking.booking_id,
+            'hotel': booking.hotel.name,
+            'room_type': booking.room.type,
+            'check_in': booking.check_in.strftime('%Y-%m-%d'),
+            'check_out': booking.check_out.strftime('%Y-%m-%d'),
+            'status': booking.status,
+            'payment_status': booking.payment_status,
+            'total_price': booking.total_price
+        } for booking in bookings],
+        'html': render_template('profile_booking_rows.html', bookings=bookings, section=section),
+        'next_cursor': next_cursor
+    })
 
 @app.route('/booking/confirmation/<int:booking_id>')
 @login_required
@@ -872,19 +1017,19 @@ def booking_confirmation(booking_id):
             flash('This booking is not yet confirmed', 'error')
             return redirect(url_for('index'))
             
-        # Calculate advance booking discount
-        days_until_checkin = (booking.check_in - datetime.utcnow()).days
-        if days_until_checkin > 60:
-            booking.advance_booking_discount = 0.15  # 15% discount
-        elif days_until_checkin > 30:
-            booking.advance_booking_discount = 0.10  # 10% discount
-        else:
-            booking.advance_booking_discount = 0
-            
-        db.session.commit()
+        # The advance booking discount was fixed when the booking was priced
+        discount = booking.advance_booking_discount
+        subtotal = booking.total_price / (1 - discount)
+        currency = display_currency()
+        names = ['base_price', 'extra_guest_charge', 'subtotal', 'discount', 'total', 'half_total']
+        amounts = [booking.room.base_price, booking.room.base_price * 0.1, subtotal,
+                   subtotal * discount, booking.total_price, booking.total_price * 0.5]
+        prices = dict(zip(names, convert_prices(amounts, currency)))
             
         return render_template('booking_confirmation.html', 
-                             booking=booking)
+                             booking=booking,
+                             prices=prices,
+                             currency=currency)
                              
     except Exception as e:
         app.logger.error(f"Error in booking confirmation route: {str(e)}")
@@ -901,46 +1046,35 @@ def cancel_booking(booking_id):
     
     if request.method == 'POST':
         booking.status = 'cancelled'
+        sync_booking_nights(booking)
         db.session.commit()
+        search_cache.invalidate_booking(booking)
         flash('Booking cancelled successfully')
         return redirect(url_for('profile'))
     
     # Calculate cancellation charges
-    days_until_checkin = (booking.check_in - datetime.utcnow()).days
-    if days_until_checkin > 7:
-        cancellation_charge = 0
-    elif days_until_checkin > 3:
-        cancellation_charge = booking.total_price * 0.5
-    else:
-        cancellation_charge = booking.total_price
+    charge, charge_reason = cancellation_charge(booking.total_price, booking.check_in)
     
     return render_template('cancellation.html',
                          booking=booking,
-                         cancellation_charge=cancellation_charge)
+                         cancellation_charge=charge,
+                         cancellation_reason=charge_reason)
 
 @app.route('/api/check-availability', methods=['POST'])
+@replica_reads
 def check_availability():
-    data = request.get_json()
-    hotel_id = data.get('hotel_id')
+    data = request.get_json(silent=True) or {}
+    try:
+        hotel_id = int(data['hotel_id'])
+        check_in = datetime.strptime(data['check_in'], '%Y-%m-%d')
+        check_out = datetime.strptime(data['check_out'], '%Y-%m-%d')
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'hotel_id must be an integer and check_in and check_out YYYY-MM-DD'}), 400
     room_type = data.get('room_type')
-    check_in = datetime.strptime(data.get('check_in'), '%Y-%m-%d')
-    check_out = datetime.strptime(data.get('check_out'), '%Y-%m-%d')
     
-    # Check if there are any overlapping bookings
-    overlapping_bookings = Booking.query.filter(
-        Booking.hotel_id == hotel_id,
-        Booking.status != 'cancelled',
-        Booking.check_in < check_out,
-        Booking.check_out > check_in
-    ).join(Room).filter(Room.type == room_type).count()
+    free_rooms = availability.free_room_count(hotel_id, room_type, check_in, check_out)
     
-    # Get total rooms of this type
-    total_rooms = Room.query.filter_by(
-        hotel_id=hotel_id,
-        type=room_type
-    ).count()
-    
-    return jsonify({'available': overlapping_bookings < total_rooms})
+    return jsonify({'available': free_rooms > 0})
 
 @app.route('/download/receipt/<int:booking_id>')
 @login_required
@@ -950,6 +1084,12 @@ def download_receipt(booking_id):
         flash('Unauthorized access')
         return redirect(url_for('index'))
     
+    currency = display_currency()
+    total, = convert_prices([booking.total_price], currency)
+    total_line = f"{currency_symbol(currency)}{total:.2f}"
+    if currency != 'GBP':
+        total_line += f" (£{booking.total_price:.2f})"
+    
     # Generate receipt logic here
     # For now, we'll just return a simple text file
     content = f"""
@@ -961,7 +1101,7 @@ def download_receipt(booking_id):
     Check-in: {booking.check_in.strftime('%Y-%m-%d')}
     Check-out: {booking.check_out.strftime('%Y-%m-%d')}
     Guests: {booking.guests}
-    Total Price: ${booking.total_price:.2f}
+    Total Price: {total_line}
     """
     
     return content, 200, {
@@ -986,10 +1126,12 @@ def admin_login():
 
 @app.route('/admin/dashboard')
 @admin_required
+@replica_reads
 def admin_dashboard():
-    hotels = Hotel.query.all()
-    recent_bookings = Booking.query.order_by(Booking.created_at.desc()).limit(5).all()
-    return render_template('admin/dashboard.html', hotels=hotels, recent_bookings=recent_bookings)
+    stats = dashboard_stats.get()
+    recent_bookings = Booking.query.options(joinedload(Booking.user), joinedload(Booking.hotel)).order_by(
+        Booking.created_at.desc()).limit(5).all()
+    return render_template('admin/dashboard.html', stats=stats, recent_bookings=recent_bookings)
 
 @app.route('/admin/hotels', methods=['GET', 'POST'])
 @admin_required
@@ -1005,11 +1147,20 @@ def admin_hotels():
         )
         db.session.add(hotel)
         db.session.commit()
+        search_cache.invalidate_city(hotel.city)
         flash('Hotel added successfully', 'success')
         return redirect(url_for('admin_hotels'))
     
-    hotels = Hotel.query.all()
-    return render_template('admin/hotels.html', hotels=hotels, form=form)
+    try:
+        filters = listing_filters(request.args)
+        hotels, next_cursor = hotel_page(filters, request.args.get('cursor'),
+                                         page_size(request.args, app.config['ADMIN_PAGE_SIZE']))
+    except (ValueError, InvalidCursor) as e:
+        flash(f'Invalid filter: {e}', 'error')
+        filters = {}
+        hotels, next_cursor = hotel_page(filters, per_page=app.config['ADMIN_PAGE_SIZE'])
+    return render_template('admin/hotels.html', hotels=hotels, next_cursor=next_cursor, filters=filters,
+                           room_counts=room_counts([hotel.id for hotel in hotels]), form=form)
 
 @app.route('/admin/hotel/<int:hotel_id>/rooms', methods=['GET', 'POST'])
 @admin_required
@@ -1023,42 +1174,250 @@ def admin_rooms(hotel_id):
             type=form.type.data,
             description=form.description.data,
             base_price=form.base_price.data,
-            max_guests=form.max_guests.data,
+            price=form.base_price.data,
+            capacity=form.max_guests.data,
             available=form.available.data
         )
         db.session.add(room)
+        db.session.flush()
+        refresh_room_calendar(room)
         db.session.commit()
+        search_cache.invalidate_city(hotel.city)
         flash('Room added successfully', 'success')
         return redirect(url_for('admin_rooms', hotel_id=hotel_id))
     
-    rooms = hotel.rooms
-    return render_template('admin/rooms.html', hotel=hotel, rooms=rooms, form=form)
+    try:
+        filters = dict(listing_filters(request.args), hotel_id=hotel_id)
+        rooms, next_cursor = room_page(filters, request.args.get('cursor'),
+                                       page_size(request.args, app.config['ADMIN_PAGE_SIZE']))
+    except (ValueError, InvalidCursor) as e:
+        flash(f'Invalid filter: {e}', 'error')
+        filters = {'hotel_id': hotel_id}
+        rooms, next_cursor = room_page(filters, per_page=app.config['ADMIN_PAGE_SIZE'])
+    return render_template('admin/rooms.html', hotel=hotel, rooms=rooms, next_cursor=next_cursor,
+                           filters=filters, form=form)
+
+@app.route('/admin/api/hotels')
+@admin_required
+def admin_api_hotels():
+    # ?city=&name=<prefix>&min_rating=&room_type=&per_page=&cursor=
+    try:
+        hotels, next_cursor = hotel_page(listing_filters(request.args), request.args.get('cursor'),
+                                         page_size(request.args, app.config['ADMIN_PAGE_SIZE']))
+    except (ValueError, InvalidCursor) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    counts = room_type_counts([hotel.id for hotel in hotels])
+    return jsonify({'hotels': [hotel_json(hotel, counts[hotel.id]) for hotel in hotels],
+                    'next_cursor': next_cursor})
+
+@app.route('/admin/api/rooms')
+@admin_required
+def admin_api_rooms():
+    # The hotel filters plus ?hotel_id=&available=true|false
+    try:
+        rooms, next_cursor = room_page(listing_filters(request.args), request.args.get('cursor'),
+                                       page_size(request.args, app.config['ADMIN_PAGE_SIZE']))
+    except (ValueError, InvalidCursor) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'rooms': [room_json(room) for room in rooms], 'next_cursor': next_cursor})
+
+@app.route('/admin/import/<kind>', methods=['POST'])
+@admin_required
+def admin_bulk_import(kind):
+    # multipart upload of a CSV, JSON or JSON Lines file; answers with the per-row report
+    if kind not in IMPORT_KINDS:
+        return jsonify({'error': f"kind must be one of {', '.join(IMPORT_KINDS)}"}), 404
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'error': 'no file uploaded'}), 400
+    
+    try:
+        report = import_file(kind, upload.stream, file_format(upload.filename, request.form.get('format')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(report)
 
 @app.route('/admin/reports')
 @admin_required
+@replica_reads
 def admin_reports():
-    hotels = Hotel.query.all()
-    current_month = datetime.utcnow().replace(day=1)
+    # Both lists read the revenue rollups rather than scanning bookings
+    hotel_totals = db.select(
+        RevenueDaily.hotel_id,
+        db.func.sum(RevenueDaily.bookings).label('total_bookings'),
+        db.func.sum(RevenueDaily.revenue).label('total_revenue')
+    ).group_by(RevenueDaily.hotel_id).subquery()
+    reports = [
+        {'hotel': hotel, 'total_bookings': total_bookings, 'total_revenue': total_revenue}
+        for hotel, total_bookings, total_revenue in db.session.execute(
+            db.select(Hotel,
+                      db.func.coalesce(hotel_totals.c.total_bookings, 0),
+                      db.func.coalesce(hotel_totals.c.total_revenue, 0.0)
+                      ).outerjoin(hotel_totals, hotel_totals.c.hotel_id == Hotel.id).order_by(Hotel.id))
+    ]
     
-    # Generate reports for each hotel
-    reports = []
-    for hotel in hotels:
-        report = {
-            'hotel': hotel,
-            'total_bookings': Booking.query.filter_by(hotel_id=hotel.id).count(),
-            'total_revenue': sum([booking.total_price for booking in Booking.query.filter_by(hotel_id=hotel.id).all()])
-        }
-        reports.append(report)
+    # Last 30 days, for every hotel at once
+    performance = hotel_performance()
+    recent = dict(zip(performance['hotel_id'],
+                      zip(performance['occupancy_rate'], performance['cancellation_rate'])))
+    for report in reports:
+        report['occupancy_rate'], report['cancellation_rate'] = recent.get(report['hotel'].id, (0, 0))
     
     # Get top customers
     top_customers = db.session.query(
         User,
-        db.func.count(Booking.id).label('booking_count'),
-        db.func.sum(Booking.total_price).label('total_spent')
-    ).join(Booking).group_by(User.id).order_by(db.text('total_spent DESC')).limit(5).all()
+        db.func.sum(CustomerRevenue.bookings).label('booking_count'),
+        db.func.sum(CustomerRevenue.revenue).label('total_spent')
+    ).join(CustomerRevenue, CustomerRevenue.user_id == User.id).group_by(User.id).order_by(
+        db.text('total_spent DESC')).limit(5).all()
     
     return render_template('admin/reports.html', reports=reports, top_customers=top_customers)
 
+def export_response(export_format, filename, rows, headers=EXPORT_HEADERS, **xlsx_options):
+    """Stream `rows` back as a CSV or XLSX attachment."""
+    if export_format == 'csv':
+        # The first bytes go out before the query has finished fetching
+        return Response(stream_with_context(iter_csv(rows, headers)), mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename={filename}.csv'})
+    
+    if export_format == 'xlsx':
+        # A workbook is a zip archive that can only be finalized once every row
+        # is written, so build it in an anonymous temporary file and stream that
+        output = tempfile.TemporaryFile()
+        try:
+            write_xlsx(rows, output, headers, **xlsx_options)
+        except Exception:
+            output.close()
+            raise
+        output.seek(0)
+        return send_file(output, as_attachment=True, download_name=f'{filename}.xlsx',
+                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    
+    return jsonify({'error': 'format must be csv or xlsx'}), 400
+
+def export_date_range():
+    """Optional start/end (YYYY-MM-DD) query arguments; raises ValueError if malformed."""
+    start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else None
+    end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else None
+    return start, end
+
+@app.route('/admin/export/bookings')
+@admin_required
+@replica_reads
+def admin_export_bookings():
+    try:
+        start, end = export_date_range()
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD'}), 400
+    
+    return export_response(request.args.get('format', 'csv'), f"bookings_{datetime.utcnow():%Y%m%d_%H%M%S}",
+                           export_rows(start, end))
+
+@app.route('/admin/export/performance')
+@admin_required
+@replica_reads
+def admin_export_performance():
+    try:
+        start, end = export_date_range()
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD'}), 400
+    
+    performance = hotel_performance(
+        start_date=datetime.combine(start, datetime.min.time()) if start else None,
+        end_date=datetime.combine(end, datetime.max.time()) if end else None)
+    headers = [column.replace('_', ' ').title() for column in performance['columns']]
+    return export_response(request.args.get('format', 'csv'), f"hotel_performance_{datetime.utcnow():%Y%m%d_%H%M%S}",
+                           performance_rows(performance), headers, sheet_name='Performance',
+                           money_headers=('Total Revenue', 'Average Booking Value'))
+
+# Report types of the reports page that map onto a revenue series
+REPORT_SERIES_TYPES = {'monthly': ('month', None), 'daily': ('day', None), 'weekly': ('week', None),
+                       'hotel': ('day', 'hotel'), 'room_type': ('day', 'room_type')}
+
+def report_date(value):
+    """A date as YYYY-MM-DD or, as the date range picker sends it, MM/DD/YYYY."""
+    for date_format in ('%Y-%m-%d', '%m/%d/%Y'):
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+@app.route('/admin/generate-report', methods=['GET', 'POST'])
+@admin_required
+@replica_reads
+def admin_report_series():
+    # GET is what charts should use: the response carries an ETag, so a redraw
+    # is answered 304 from a cache lookup until a booking changes
+    args = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    if not isinstance(args, dict):
+        return jsonify({'error': 'the request body must be a JSON object'}), 400
+    report_type = args.get('type', 'monthly')
+    if not isinstance(report_type, str) or report_type not in REPORT_SERIES_TYPES:
+        return jsonify({'error': f'unknown report type {report_type!r}'}), 400
+    bucket, group_by = REPORT_SERIES_TYPES[report_type]
+    bucket = args.get('bucket') or bucket
+    group_by = args.get('group') or group_by
+    if bucket not in BUCKETS or (group_by is not None and group_by not in GROUPS):
+        return jsonify({'error': f"bucket must be one of {', '.join(BUCKETS)} "
+                                 f"and group one of {', '.join(GROUPS)}"}), 400
+    
+    start_value = args.get('start') or args.get('startDate')
+    end_value = args.get('end') or args.get('endDate')
+    try:
+        end = report_date(end_value) if end_value else datetime.utcnow().date()
+        start = report_date(start_value) if start_value else end - timedelta(days=29)
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({'error': 'dates must be YYYY-MM-DD or MM/DD/YYYY'}), 400
+    if start > end:
+        return jsonify({'error': 'start must not be after end'}), 400
+    if bucket_count(start, end, bucket) > MAX_BUCKETS:
+        return jsonify({'error': f'the range spans more than {MAX_BUCKETS} {bucket} buckets'}), 400
+    
+    params = {'start': start, 'end': end, 'bucket': bucket, 'group_by': group_by}
+    etag = revenue_series.etag(params)
+    if request.method == 'GET' and etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = jsonify(revenue_series.get(params, etag))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/admin/cache-stats')
+@admin_required
+def admin_cache_stats():
+    return jsonify({'search': search_cache.stats()})
+
+@app.route('/admin/pool-stats')
+@admin_required
+def admin_pool_stats():
+    return jsonify({'pools': pool_metrics.stats(), 'read_replicas': read_replicas.stats()})
+
+@app.route('/admin/query-stats', methods=['GET', 'POST'])
+@admin_required
+def admin_query_stats():
+    # POST starts a fresh measurement, e.g. after deploying a fix
+    if request.method == 'POST':
+        query_stats.reset()
+    return jsonify({'routes': query_stats.stats(), 'repeat_threshold': query_stats.threshold})
+
+@app.route('/admin/profiles')
+@admin_required
+def admin_profiles():
+    return render_template('admin/profiles.html', profiles=request_profiler.profiles(limit=100),
+                           sample_rate=request_profiler.sample_rate)
+
+@app.route('/admin/profiles/<name>.<kind>')
+@admin_required
+def admin_profile_file(name, kind):
+    path = request_profiler.path(name, kind)
+    if path is None:
+        return render_template('404.html'), 404
+    return send_file(path, as_attachment=True, download_name=f'{name}.{kind}')
+
 @app.route('/admin/currencies', methods=['GET', 'POST'])
 @admin_required
 def admin_currencies():
@@ -1077,6 +1436,11 @@ def admin_currencies():
     currencies = Currency.query.all()
     return render_template('admin/currencies.html', currencies=currencies, form=form)
 
+@app.route('/metrics')
+def metrics():
+    # Scraped by Prometheus; see request_metrics.py
+    return Response(request_metrics.exposition(), content_type=CONTENT_TYPE_LATEST)
+
 # Error handlers
 @app.errorhandler(404)
 def not_found_error(error):
@@ -1087,6 +1451,73 @@ def internal_error(error):
     db.session.rollback()
     return render_template('500.html'), 500
 
+@app.cli.command('backfill-ledger')
+def backfill_ledger_command():
+    """Rebuild the room-night ledger from existing bookings."""
+    result = backfill_ledger()
+    print(f"Ledger rebuilt with {result['nights']} room-nights")
+    for conflict in result['conflicts']:
+        print(f"Conflict: room {conflict['room_id']} on {conflict['night']} is held by booking "
+              f"{conflict['held_by']}, skipped booking {conflict['booking_id']}")
+
+@app.cli.command('check-ledger')
+def check_ledger_command():
+    """Compare the room-night ledger against the bookings table."""
+    report = check_ledger()
+    if report['consistent'] and not report['conflicts']:
+        print("Ledger is consistent with bookings")
+        return
+    for problem in ('missing', 'orphaned', 'mismatched', 'conflicts'):
+        for entry in report[problem]:
+            print(f"{problem}: {entry}")
+    raise SystemExit(1)
+
+@app.cli.command('rebuild-revenue-rollup')
+def rebuild_revenue_rollup_command():
+    """Recompute the revenue rollups from the bookings table."""
+    result = revenue_rollup.rebuild()
+    print(f"Rebuilt {result['daily_rows']} daily and {result['customer_rows']} customer revenue rows")
+
+@app.cli.command('build-sales-reports')
+@click.option('--start', help='First month to build, YYYY-MM (default: last month)')
+@click.option('--end', help='Last month to build, YYYY-MM (default: this month)')
+def build_sales_reports_command(start, end):
+    """Materialize monthly sales reports for every hotel over a range of months."""
+    this_month = datetime.utcnow().date().replace(day=1)
+    end_month = datetime.strptime(end, '%Y-%m').date() if end else this_month
+    start_month = (datetime.strptime(start, '%Y-%m').date() if start
+                   else (this_month - timedelta(days=1)).replace(day=1))
+    rows = build_sales_reports(start_month, end_month)
+    print(f"Wrote {rows} sales report rows for {start_month:%Y-%m} to {end_month:%Y-%m}")
+
+@app.cli.command('refresh-price-calendar')
+def refresh_price_calendar_command():
+    """Roll the room price calendar forward to the current booking window."""
+    result = refresh_calendar()
+    print(f"Price calendar covers {result['window_start']} to {result['window_end']}, "
+          f"added {result['nights_added']} room-nights")
+
+@app.cli.command('import-inventory')
+@click.argument('kind', type=click.Choice(IMPORT_KINDS))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json', 'jsonl']),
+              help='File format (default: from the file extension)')
+@click.option('--chunk-size', default=500, show_default=True, help='Rows per batched INSERT')
+def import_inventory_command(kind, path, fmt, chunk_size):
+    """Bulk-import hotels or rooms from a CSV, JSON or JSON Lines file."""
+    try:
+        with open(path, 'rb') as stream:
+            report = import_file(kind, stream, file_format(path, fmt), chunk_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for error in report['errors']:
+        print(f"row {error['row']}: {'; '.join(error['errors'])}")
+    if report['errors_truncated']:
+        print(f"... {report['failed'] - len(report['errors'])} more rows failed")
+    print(f"Imported {report['inserted']} of {report['rows']} {kind}, {report['failed']} failed")
+    if report['read_error']:
+        raise click.ClickException(f"{report['read_error']}; the rest of the file was not imported")
+
 def init_db():
     """Initialize the database with sample data"""
     try:
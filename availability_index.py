@@ -0,0 +1,206 @@
+from bisect import bisect_left, insort
+from datetime import date, datetime
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+import inventory
+
+MODES = ('off', 'on', 'verify')
+
+
+def _ordinal(value) -> int:
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal()
+
+
+class _RoomIntervals:
+    """Sorted, immutable [start, end) ordinal intervals held against one room."""
+
+    __slots__ = ('starts', 'max_ends', 'intervals')
+
+    def __init__(self, intervals: List[Tuple[int, int, int]]):
+        self.intervals = intervals
+        self.starts = [start for start, _, _ in intervals]
+        # Running max of end ordinals so overlapping (legacy) bookings still answer correctly
+        self.max_ends = []
+        running = 0
+        for _, end, _ in intervals:
+            running = max(running, end)
+            self.max_ends.append(running)
+
+    def is_free(self, start: int, end: int) -> bool:
+        # Intervals starting before `end` overlap iff one of them ends after `start`
+        idx = bisect_left(self.starts, end)
+        return idx == 0 or self.max_ends[idx - 1] <= start
+
+
+class AvailabilityIndex:
+    """
+    In-process index of held room intervals, answering availability questions
+    without a database round trip. Built lazily from `Booking`, kept current by
+    session commit events and fully rebuilt after `AVAILABILITY_INDEX_MAX_AGE`
+    seconds so changes committed by other worker processes are picked up.
+
+    Modes (`AVAILABILITY_INDEX`): 'off' always uses the ledger in the database,
+    'on' answers from memory, 'verify' answers from the database and logs any
+    disagreement with the index.
+
+    The index only serves read paths (free_room_count for the availability
+    API). It can lag other workers by up to the max age, so it never decides
+    a booking: booking() checks inventory.is_room_free against the ledger.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.app = None
+        self.db = None
+        self.mode = 'on'
+        self.max_age = 60
+        self.mismatches = 0
+        self._rooms: Dict[int, _RoomIntervals] = {}
+        self._rooms_by_type: Dict[Tuple[int, str], List[int]] = {}
+        self._booking_rooms: Dict[int, int] = {}
+        self._built_at: Optional[float] = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        app.config.setdefault('AVAILABILITY_INDEX', 'on')
+        app.config.setdefault('AVAILABILITY_INDEX_MAX_AGE', 60)
+        mode = app.config['AVAILABILITY_INDEX']
+        if mode not in MODES:
+            raise ValueError(f"AVAILABILITY_INDEX must be one of {', '.join(MODES)}, got {mode!r}")
+
+        self.app = app
+        self.db = db
+        self.mode = mode
+        self.max_age = int(app.config['AVAILABILITY_INDEX_MAX_AGE'])
+
+        event.listen(db.session, 'after_flush', self._collect_changes)
+        event.listen(db.session, 'after_commit', self._apply_changes)
+        event.listen(db.session, 'after_rollback', self._discard_changes)
+
+    # Building
+
+    def rebuild(self) -> None:
+        """Load every room and every still-relevant held booking from the database."""
+        from app import Booking, Room
+
+        today = date.today()
+        rooms_by_type = {}
+        # Always from the primary: the index is shared by every later request
+        # and must not inherit a lagging replica's view of the bookings
+        primary = {'bind': self.db.engine}
+        for room_id, hotel_id, room_type in self.db.session.execute(
+                self.db.select(Room.id, Room.hotel_id, Room.type), bind_arguments=primary):
+            rooms_by_type.setdefault((hotel_id, room_type), []).append(room_id)
+
+        per_room = {}
+        booking_rooms = {}
+        bookings = self.db.session.execute(
+            self.db.select(Booking.id, Booking.room_id, Booking.check_in, Booking.check_out).where(
+                Booking.status.in_(inventory.ACTIVE_BOOKING_STATUSES),
+                Booking.payment_status != 'cancelled',
+                Booking.check_out > datetime.combine(today, datetime.min.time())
+            ).execution_options(yield_per=1000),
+            bind_arguments=primary
+        )
+        for booking_id, room_id, check_in, check_out in bookings:
+            per_room.setdefault(room_id, []).append((_ordinal(check_in), _ordinal(check_out), booking_id))
+            booking_rooms[booking_id] = room_id
+
+        with self._lock:
+            self._rooms = {room_id: _RoomIntervals(sorted(intervals)) for room_id, intervals in per_room.items()}
+            self._rooms_by_type = rooms_by_type
+            self._booking_rooms = booking_rooms
+            self._built_at = time.monotonic()
+
+    def _ensure_fresh(self) -> None:
+        if self._built_at is None or time.monotonic() - self._built_at > self.max_age:
+            self.rebuild()
+
+    # Incremental maintenance
+
+    def _collect_changes(self, session, flush_context):
+        from app import Booking, Room
+
+        changes = session.info.setdefault('availability_changes', {})
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, Booking):
+                held = obj not in session.deleted and inventory.holds_inventory(obj)
+                changes[('booking', obj.id)] = (obj.room_id, obj.check_in, obj.check_out, held)
+            elif isinstance(obj, Room):
+                changes[('room', obj.id)] = (obj.hotel_id, obj.type, obj not in session.deleted)
+
+    def _apply_changes(self, session):
+        changes = session.info.pop('availability_changes', None)
+        if not changes or self._built_at is None:
+            return
+        with self._lock:
+            for (kind, obj_id), change in changes.items():
+                if kind == 'booking':
+                    self._apply_booking(obj_id, *change)
+                else:
+                    self._apply_room(obj_id, *change)
+
+    def _discard_changes(self, session):
+        session.info.pop('availability_changes', None)
+
+    def _apply_booking(self, booking_id, room_id, check_in, check_out, held):
+        previous_room = self._booking_rooms.pop(booking_id, None)
+        if previous_room is not None:
+            remaining = [interval for interval in self._rooms[previous_room].intervals
+                         if interval[2] != booking_id]
+            self._rooms[previous_room] = _RoomIntervals(remaining)
+        if held:
+            intervals = list(self._rooms[room_id].intervals) if room_id in self._rooms else []
+            insort(intervals, (_ordinal(check_in), _ordinal(check_out), booking_id))
+            self._rooms[room_id] = _RoomIntervals(intervals)
+            self._booking_rooms[booking_id] = room_id
+
+    def _apply_room(self, room_id, hotel_id, room_type, exists):
+        # Replace lists rather than mutating them; readers iterate without the lock
+        rooms_by_type = {key: [other for other in room_ids if other != room_id]
+                         for key, room_ids in self._rooms_by_type.items()}
+        if exists:
+            rooms_by_type.setdefault((hotel_id, room_type), []).append(room_id)
+        self._rooms_by_type = rooms_by_type
+
+    # Queries
+
+    def _index_free_room_count(self, hotel_id, room_type, check_in, check_out) -> int:
+        start, end = _ordinal(check_in), _ordinal(check_out)
+        rooms = self._rooms
+        count = 0
+        for room_id in self._rooms_by_type.get((hotel_id, room_type), ()):
+            intervals = rooms.get(room_id)
+            if intervals is None or intervals.is_free(start, end):
+                count += 1
+        return count
+
+    def _answer(self, indexed, from_db, description):
+        if self.mode == 'off':
+            return from_db()
+        self._ensure_fresh()
+        if self.mode == 'on':
+            return indexed()
+
+        expected = from_db()
+        actual = indexed()
+        if actual != expected:
+            self.mismatches += 1
+            self.app.logger.warning(f"Availability index mismatch for {description}: "
+                                    f"index={actual}, database={expected}")
+        return expected
+
+    def free_room_count(self, hotel_id: int, room_type: str, check_in, check_out) -> int:
+        """Count rooms of a type in a hotel that are free for [check_in, check_out)."""
+        return self._answer(
+            lambda: self._index_free_room_count(hotel_id, room_type, check_in, check_out),
+            lambda: inventory.free_room_count(hotel_id, room_type, check_in, check_out),
+            f"hotel {hotel_id} {room_type} rooms {check_in}..{check_out}"
+        )
@@ -0,0 +1,81 @@
+"""
+Benchmark the batch pricing engine against the original per-night loop.
+
+    python bench_pricing.py [num_quotes]
+
+Quotes mimic real traffic: a few hundred distinct stays within the 365-day
+booking window, each priced for many rooms.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+import math
+import random
+import sys
+import time
+
+from pricing import price_many
+
+RoomPrices = namedtuple('RoomPrices', ['base_price', 'peak_price'])
+
+
+def legacy_calculate_price(room, check_in, check_out):
+    """The per-night loop previously in Room.calculate_price, kept as the reference."""
+    nights = (check_out - check_in).days
+    if nights <= 0:
+        return None
+
+    total_price = 0
+    current_date = check_in
+    while current_date < check_out:
+        is_weekend = current_date.weekday() >= 5
+        is_peak = current_date.month in [4, 5, 6, 7, 8, 11, 12]
+
+        if is_peak:
+            day_price = room.peak_price or (room.base_price * 1.3)
+        else:
+            day_price = room.base_price
+
+        if is_weekend:
+            day_price *= 1.2
+
+        total_price += day_price
+        current_date += timedelta(days=1)
+
+    return total_price
+
+
+def build_quotes(count, seed=42):
+    rng = random.Random(seed)
+    today = date.today()
+    rooms = [RoomPrices(base, rng.choice([None, base * 1.3, base * 1.5]))
+             for base in (rng.choice([80.0, 100.0, 125.5, 150.0, 200.0, 260.0]) for _ in range(200))]
+    stays = []
+    for _ in range(300):
+        check_in = today + timedelta(days=rng.randint(0, 365))
+        stays.append((check_in, check_in + timedelta(days=rng.randint(1, 30))))
+    return [(rng.choice(rooms),) + rng.choice(stays) for _ in range(count)]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    quotes = build_quotes(count)
+
+    start = time.perf_counter()
+    expected = [legacy_calculate_price(room, check_in, check_out) for room, check_in, check_out in quotes]
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = price_many(quotes)
+    batch_seconds = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(actual, expected) if not math.isclose(a, b, rel_tol=1e-12))
+    print(f"Quotes:          {count}")
+    print(f"Per-night loop:  {legacy_seconds * 1000:.1f} ms")
+    print(f"Batch engine:    {batch_seconds * 1000:.1f} ms")
+    print(f"Speedup:         {legacy_seconds / batch_seconds:.1f}x")
+    print(f"Mismatches:      {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import csv
+from datetime import date, datetime, timedelta
+import io
+from typing import Iterator, Optional
+
+# Rows fetched per round trip; the driver streams them through a server-side cursor
+FETCH_SIZE = 1000
+# CSV rows buffered per chunk sent to the client
+CSV_CHUNK_ROWS = 500
+
+EXPORT_HEADERS = [
+    'Booking ID', 'Reference', 'Status', 'Payment Status', 'Payment Method',
+    'Booking Date', 'Check-in', 'Check-out', 'Guests', 'Total Price (GBP)',
+    'Advance Booking Discount', 'Hotel ID', 'Hotel', 'City', 'Room ID', 'Room Type',
+    'User ID', 'Username', 'Email'
+]
+
+
+def export_rows(start: Optional[date] = None, end: Optional[date] = None) -> Iterator[tuple]:
+    """
+    Bookings joined with hotel, room and user, in id order, optionally limited
+    to bookings made between `start` and `end` (inclusive). Rows are streamed
+    with yield_per so memory stays flat however many bookings there are.
+    """
+    from app import db, Booking, Hotel, Room, User
+
+    statement = db.select(
+        Booking.id, Booking.booking_id, Booking.status, Booking.payment_status, Booking.payment_method,
+        Booking.booking_date, Booking.check_in, Booking.check_out, Booking.guests, Booking.total_price,
+        Booking.advance_booking_discount, Hotel.id, Hotel.name, Hotel.city, Room.id, Room.type,
+        User.id, User.username, User.email
+    ).join(Hotel, Booking.hotel_id == Hotel.id).join(
+        Room, Booking.room_id == Room.id).join(User, Booking.user_id == User.id).order_by(Booking.id)
+    if start:
+        statement = statement.where(Booking.booking_date >= datetime.combine(start, datetime.min.time()))
+    if end:
+        statement = statement.where(
+            Booking.booking_date < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+
+    result = db.session.execute(statement.execution_options(yield_per=FETCH_SIZE))
+    try:
+        for row in result:
+            yield tuple(row)
+    finally:
+        result.close()
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def iter_csv(rows, headers=EXPORT_HEADERS) -> Iterator[str]:
+    """Encode rows as CSV, yielding the header straight away and then one chunk per CSV_CHUNK_ROWS rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    pending = 0
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        pending += 1
+        if pending >= CSV_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue()
+
+
+def write_xlsx(rows, output, headers=EXPORT_HEADERS, sheet_name='Bookings',
+               money_headers=('Total Price (GBP)',)) -> int:
+    """
+    Write rows as an XLSX workbook to `output`, a path or binary file, in
+    XlsxWriter's constant_memory mode, which flushes each row to disk once
+    the next one starts. Returns the number of rows written.
+    """
+    # Imported here so only processes that actually export pay for loading it
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    try:
+        sheet = workbook.add_worksheet(sheet_name)
+        bold = workbook.add_format({'bold': True})
+        datetime_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm'})
+        money_format = workbook.add_format({'num_format': '#,##0.00'})
+
+        sheet.write_row(0, 0, headers, bold)
+        money_columns = {headers.index(header) for header in money_headers if header in headers}
+        count = 0
+        for count, row in enumerate(rows, start=1):
+            for column, value in enumerate(row):
+                if isinstance(value, datetime):
+                    sheet.write_datetime(count, column, value, datetime_format)
+                elif column in money_columns and value is not None:
+                    sheet.write_number(count, column, value, money_format)
+                else:
+                    sheet.write(count, column, value)
+        return count
+    finally:
+        workbook.close()
@@ -0,0 +1,374 @@
+import codecs
+import csv
+import json
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from db_pool import as_bool
+
+KINDS = ('hotels', 'rooms')
+FORMATS = ('csv', 'json', 'jsonl')
+# Rows per executemany INSERT, each committed on its own
+CHUNK_SIZE = 500
+# Row errors kept in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+# Raised while reading a file that is not valid CSV or a JSON document that
+# cannot be parsed (UnicodeDecodeError and JSONDecodeError are ValueErrors)
+READ_ERRORS = (ValueError, csv.Error)
+
+# Bytes that are not UTF-8, as decoded by the surrogateescape error handler
+_UNDECODABLE = re.compile('[\udc80-\udcff]')
+
+
+def file_format(filename: Optional[str], requested: Optional[str] = None) -> str:
+    """The import format, as requested or from the file extension; raises ValueError if unknown."""
+    value = (requested or (filename or '').rsplit('.', 1)[-1]).lower()
+    value = {'ndjson': 'jsonl'}.get(value, value)
+    if value not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    return value
+
+
+def _lines(stream) -> Iterator[str]:
+    """
+    The stream's lines, each decoded on its own so a bad byte spoils only
+    its line. Bytes that are not UTF-8 are kept as surrogates (see
+    _UNDECODABLE) for the caller to report against the row they are in.
+    """
+    for number, line in enumerate(stream):
+        if number == 0 and line.startswith(codecs.BOM_UTF8):
+            line = line[len(codecs.BOM_UTF8):]
+        yield line.decode('utf-8', 'surrogateescape')
+
+
+def read_rows(stream, fmt: str) -> Iterator[Tuple[int, object]]:
+    """
+    (row number, record) pairs from a binary stream; a row that cannot be
+    decoded or parsed is yielded as a ValueError. Row numbers count data
+    records from 1, so they match a spreadsheet's line number minus the
+    header for CSV.
+
+    CSV and JSON Lines are streamed one record at a time. A JSON document
+    must be an array of objects and is read into memory whole, so large
+    imports should use one of the other two formats.
+    """
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(_lines(stream)), start=1):
+            if any(_UNDECODABLE.search(value) for value in row.values() if isinstance(value, str)):
+                yield number, ValueError('row is not valid UTF-8')
+            else:
+                yield number, row
+    elif fmt == 'jsonl':
+        number = 0
+        for line in _lines(stream):
+            if not line.strip():
+                continue
+            number += 1
+            if _UNDECODABLE.search(line):
+                yield number, ValueError('row is not valid UTF-8')
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError as e:
+                yield number, ValueError(f'invalid JSON: {e}')
+    else:
+        records = json.loads(stream.read())
+        if not isinstance(records, list):
+            raise ValueError('a JSON import must be an array of objects')
+        yield from enumerate(records, start=1)
+
+
+# Field parsing; each returns the value or raises ValueError with the message for the row
+
+def _text(row, field, max_length=None, required=True) -> Optional[str]:
+    value = row.get(field)
+    value = str(value).strip() if value is not None else ''
+    if not value:
+        if required:
+            raise ValueError(f'{field} is required')
+        return None
+    if max_length and len(value) > max_length:
+        raise ValueError(f'{field} must be at most {max_length} characters')
+    return value
+
+
+def _number(row, field, cast=float, minimum=None, maximum=None, default=None, required=True):
+    value = row.get(field)
+    if value is None or value == '':
+        if default is None and required:
+            raise ValueError(f'{field} is required')
+        return default
+    try:
+        value = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be a number')
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        raise ValueError(f'{field} must be between {minimum} and {maximum}' if maximum is not None
+                         else f'{field} must be at least {minimum}')
+    return value
+
+
+def _boolean(row, field, default=True) -> bool:
+    value = row.get(field)
+    if value is None or value == '':
+        return default
+    try:
+        return as_bool(value)
+    except ValueError:
+        raise ValueError(f'{field} must be true or false')
+
+
+def _string_list(row, field) -> Optional[List[str]]:
+    """A JSON list, or in CSV either a JSON array or '|'-separated values."""
+    value = row.get(field)
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        value = json.loads(value) if value.lstrip().startswith('[') else value.split('|')
+    if not isinstance(value, list):
+        raise ValueError(f'{field} must be a list')
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def _collect(parsers: Dict[str, Callable]) -> Tuple[Dict, List[str]]:
+    values, errors = {}, []
+    for field, parse in parsers.items():
+        try:
+            values[field] = parse()
+        except ValueError as e:
+            errors.append(str(e))
+    return values, errors
+
+
+def _hotel_values(row: Dict) -> Tuple[Dict, List[str]]:
+    return _collect({
+        'name': lambda: _text(row, 'name', 100),
+        'city': lambda: _text(row, 'city', 50),
+        'address': lambda: _text(row, 'address', 200),
+        'description': lambda: _text(row, 'description'),
+        'rating': lambda: _number(row, 'rating', minimum=0, maximum=5, default=0.0),
+        'amenities': lambda: _string_list(row, 'amenities'),
+        'images': lambda: _string_list(row, 'images'),
+    })
+
+
+def _room_values(row: Dict) -> Tuple[Dict, List[str]]:
+    from app import ROOM_TYPES
+
+    def room_type():
+        value = (_text(row, 'type', 50) or '').lower()
+        if value not in ROOM_TYPES:
+            raise ValueError(f"type must be one of {', '.join(ROOM_TYPES)}")
+        return value
+
+    values, errors = _collect({
+        'type': room_type,
+        'description': lambda: _text(row, 'description', required=False),
+        'base_price': lambda: _number(row, 'base_price', minimum=0),
+        'peak_price': lambda: _number(row, 'peak_price', minimum=0, required=False),
+        'capacity': lambda: _number(row, 'capacity', cast=int, minimum=1, default=2),
+        'available': lambda: _boolean(row, 'available'),
+        'amenities': lambda: _string_list(row, 'amenities'),
+        'images': lambda: _string_list(row, 'images'),
+    })
+    if 'base_price' in values:
+        try:
+            values['price'] = _number(row, 'price', minimum=0, default=values['base_price'])
+        except ValueError as e:
+            errors.append(str(e))
+    return values, errors
+
+
+class _Report:
+    def __init__(self, kind):
+        self.kind = kind
+        self.rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+        self.read_error = None
+        self.cities = set()
+        self.hotel_ids = set()
+
+    def error(self, number, messages):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': number, 'errors': list(messages)})
+
+    def as_dict(self):
+        return {'kind': self.kind, 'rows': self.rows, 'inserted': self.inserted, 'failed': self.failed,
+                'errors': self.errors, 'errors_truncated': self.failed > len(self.errors),
+                'read_error': self.read_error}
+
+
+def _insert_chunk(model, chunk: List[Tuple[int, Dict]], report: _Report) -> List[Dict]:
+    """Insert a chunk with one executemany; if the database rejects it, retry row by row to find the culprits."""
+    from app import db
+
+    try:
+        db.session.execute(db.insert(model), [values for _, values in chunk])
+        db.session.commit()
+        report.inserted += len(chunk)
+        return [values for _, values in chunk]
+    except SQLAlchemyError:
+        db.session.rollback()
+
+    inserted = []
+    for number, values in chunk:
+        try:
+            db.session.execute(db.insert(model), [values])
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            report.error(number, [str(getattr(e, 'orig', e)).splitlines()[0]])
+        else:
+            report.inserted += 1
+            inserted.append(values)
+    return inserted
+
+
+def _import(model, records: Iterable[Tuple[int, object]], validate: Callable, report: _Report,
+            chunk_size: int) -> None:
+    chunk = []
+
+    def flush():
+        for values in _insert_chunk(model, chunk, report):
+            if 'city' in values:
+                report.cities.add(values['city'])
+            if 'hotel_id' in values:
+                report.hotel_ids.add(values['hotel_id'])
+        chunk.clear()
+
+    records = iter(records)
+    while True:
+        # A file that turns unreadable part way (malformed CSV quoting, say)
+        # stops the import; rows read before that point are still inserted
+        try:
+            number, record = next(records)
+        except StopIteration:
+            break
+        except READ_ERRORS as e:
+            where = f' past row {report.rows}' if report.rows else ''
+            report.read_error = f'could not read the file{where}: {e}'
+            break
+        report.rows += 1
+        if isinstance(record, Exception):
+            report.error(number, [str(record)])
+            continue
+        if not isinstance(record, dict):
+            report.error(number, ['a row must be an object'])
+            continue
+        values, errors = validate(number, record)
+        if errors:
+            report.error(number, errors)
+            continue
+        chunk.append((number, values))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+
+def import_hotels(records: Iterable[Tuple[int, object]], chunk_size: int = CHUNK_SIZE) -> Dict:
+    """
+    Insert hotels from (row number, record) pairs. A hotel with the name and
+    city of an existing one, or of an earlier row, is reported rather than
+    duplicated, so a partly failed file can simply be imported again. A
+    repeat of an earlier row is reported as such, since that row may yet be
+    rejected by the database.
+    """
+    from app import db, Hotel
+
+    known = {(name.lower(), city.lower()) for name, city in db.session.execute(db.select(Hotel.name, Hotel.city))}
+    # (name, city) -> number of the first row in this file naming that hotel
+    first_rows = {}
+
+    def validate(number, record):
+        values, errors = _hotel_values(record)
+        if not errors:
+            key = (values['name'].lower(), values['city'].lower())
+            if key in known:
+                errors.append(f"hotel {values['name']!r} in {values['city']} already exists")
+            elif key in first_rows:
+                errors.append(f"hotel {values['name']!r} in {values['city']} repeats row {first_rows[key]}")
+            else:
+                first_rows[key] = number
+        return values, errors
+
+    report = _Report('hotels')
+    _import(Hotel, records, validate, report, chunk_size)
+    _finish(report)
+    return report.as_dict()
+
+
+def import_rooms(records: Iterable[Tuple[int, object]], chunk_size: int = CHUNK_SIZE) -> Dict:
+    """
+    Insert rooms from (row number, record) pairs. Each row names its hotel
+    by `hotel_id`, or by `hotel_name` and `hotel_city` so rooms can follow a
+    hotel import whose ids are not known in advance.
+    """
+    from app import db, Hotel, Room
+
+    hotel_cities = {}
+    hotels_by_name = {}
+    for hotel_id, name, city in db.session.execute(db.select(Hotel.id, Hotel.name, Hotel.city)):
+        hotel_cities[hotel_id] = city
+        hotels_by_name.setdefault((name.lower(), city.lower()), []).append(hotel_id)
+
+    def validate(number, record):
+        values, errors = _room_values(record)
+        try:
+            if record.get('hotel_id') not in (None, ''):
+                hotel_id = _number(record, 'hotel_id', cast=int)
+                if hotel_id not in hotel_cities:
+                    raise ValueError(f'hotel {hotel_id} does not exist')
+            else:
+                name = _text(record, 'hotel_name', 100)
+                city = _text(record, 'hotel_city', 50)
+                matches = hotels_by_name.get((name.lower(), city.lower()), [])
+                if len(matches) != 1:
+                    raise ValueError(f"{'no' if not matches else 'more than one'} hotel {name!r} in {city}")
+                hotel_id = matches[0]
+            values['hotel_id'] = hotel_id
+        except ValueError as e:
+            errors.append(str(e))
+        return values, errors
+
+    report = _Report('rooms')
+    _import(Room, records, validate, report, chunk_size)
+    report.cities = {hotel_cities[hotel_id] for hotel_id in report.hotel_ids}
+    _finish(report)
+    return report.as_dict()
+
+
+def _finish(report: _Report) -> None:
+    """Bring derived state up to date once per import rather than once per row."""
+    if not report.inserted:
+        return
+    from app import availability, dashboard_stats, search_cache
+    from price_calendar import refresh_calendar
+
+    if report.kind == 'rooms':
+        # Builds calendars for the new rooms, which bulk inserts leave without one
+        refresh_calendar()
+        # Rooms inserted in bulk bypass the index's flush hooks
+        availability.rebuild()
+    search_cache.invalidate_cities(report.cities)
+    dashboard_stats.invalidate()
+
+
+def import_file(kind: str, stream, fmt: str, chunk_size: int = CHUNK_SIZE) -> Dict:
+    """
+    Import hotels or rooms from a CSV, JSON or JSON Lines stream. Raises
+    ValueError if not a single row could be read; a file that breaks later
+    is imported up to that point, with `read_error` set in the report.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    importer = import_hotels if kind == 'hotels' else import_rooms
+    report = importer(read_rows(stream, fmt), chunk_size)
+    if report['read_error'] and not report['rows']:
+        raise ValueError(report['read_error'])
+    return report
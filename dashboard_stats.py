@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+import os
+from typing import Dict, Iterable, Optional
+
+from flask_caching import Cache
+
+from read_replicas import use_primary
+
+STATS_KEY = 'stats'
+
+
+def compute_stats(now: Optional[datetime] = None) -> Dict:
+    """
+    Every dashboard counter from a single SELECT of scalar subqueries. Booking
+    totals and revenue read the revenue rollup; only active bookings need the
+    bookings table itself.
+    """
+    from app import db, User, Hotel, Room, Booking, RevenueDaily
+
+    now = now or datetime.utcnow()
+    month = now.date().replace(day=1)
+    next_month = (month + timedelta(days=32)).replace(day=1)
+    func = db.func
+
+    def scalar(statement, name):
+        return statement.scalar_subquery().label(name)
+
+    row = db.session.execute(db.select(
+        scalar(db.select(func.count(User.id)), 'total_users'),
+        scalar(db.select(func.count(Hotel.id)), 'total_hotels'),
+        scalar(db.select(func.count(Room.id)), 'total_rooms'),
+        scalar(db.select(func.count(Room.id)).where(Room.available.is_(True)), 'available_rooms'),
+        scalar(db.select(func.coalesce(func.sum(RevenueDaily.bookings), 0)), 'total_bookings'),
+        scalar(db.select(func.count(Booking.id)).where(
+            Booking.status == 'confirmed',
+            Booking.check_out >= now
+        ), 'active_bookings'),
+        scalar(db.select(func.coalesce(func.sum(RevenueDaily.revenue), 0.0)).where(
+            RevenueDaily.status == 'confirmed'
+        ), 'total_revenue'),
+        scalar(db.select(func.coalesce(func.sum(RevenueDaily.revenue), 0.0)).where(
+            RevenueDaily.status == 'confirmed',
+            RevenueDaily.day >= month,
+            RevenueDaily.day < next_month
+        ), 'monthly_revenue')
+    )).one()
+
+    stats = dict(row._mapping)
+    stats['generated_at'] = now.isoformat()
+    return stats
+
+
+def room_counts(hotel_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, int]]:
+    """{hotel_id: {'rooms': n, 'available': m}} from one grouped query, for all hotels or `hotel_ids`."""
+    from app import db, Room
+
+    available = db.func.sum(db.case((Room.available.is_(True), 1), else_=0))
+    statement = db.select(Room.hotel_id, db.func.count(Room.id), available).group_by(Room.hotel_id)
+    if hotel_ids is not None:
+        statement = statement.where(Room.hotel_id.in_(list(hotel_ids)))
+    return {
+        hotel_id: {'rooms': rooms, 'available': int(available_rooms or 0)}
+        for hotel_id, rooms, available_rooms in db.session.execute(statement)
+    }
+
+
+class DashboardStats:
+    """
+    Admin dashboard counters behind a short-TTL cache. The default
+    FileSystemCache (or Redis, via DASHBOARD_CACHE_REDIS_URL) is shared by
+    every worker on the host, so however many screens auto-refresh, the
+    aggregate runs about once per `DASHBOARD_CACHE_TIMEOUT` seconds.
+    """
+
+    def __init__(self, app=None):
+        self.cache = Cache()
+        self.timeout = 30
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DASHBOARD_CACHE_REDIS_URL', None)
+        app.config.setdefault('DASHBOARD_CACHE_TYPE',
+                              'RedisCache' if app.config['DASHBOARD_CACHE_REDIS_URL'] else 'FileSystemCache')
+        app.config.setdefault('DASHBOARD_CACHE_DIR', os.path.join(app.instance_path, 'dashboard_cache'))
+        app.config.setdefault('DASHBOARD_CACHE_TIMEOUT', 30)
+
+        self.timeout = int(app.config['DASHBOARD_CACHE_TIMEOUT'])
+        self.cache.init_app(app, config={
+            'CACHE_TYPE': app.config['DASHBOARD_CACHE_TYPE'],
+            'CACHE_DEFAULT_TIMEOUT': self.timeout,
+            'CACHE_DIR': app.config['DASHBOARD_CACHE_DIR'],
+            'CACHE_REDIS_URL': app.config['DASHBOARD_CACHE_REDIS_URL'],
+            'CACHE_KEY_PREFIX': 'dashboard_'
+        })
+
+    def get(self) -> Dict:
+        """Cached stats, recomputed once the cached copy is older than the TTL."""
+        stats = self.cache.get(STATS_KEY)
+        if stats is None:
+            use_primary()
+            stats = compute_stats()
+            self.cache.set(STATS_KEY, stats, timeout=self.timeout)
+        return stats
+
+    def invalidate(self) -> None:
+        """Drop the cached stats, e.g. after a bulk change that should show up straight away."""
+        self.cache.delete(STATS_KEY)
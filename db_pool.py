@@ -0,0 +1,185 @@
+from bisect import bisect_left
+from itertools import accumulate
+import threading
+import time
+from typing import Dict, Mapping
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds, in seconds, of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'n', 'off')
+
+
+def as_bool(value) -> bool:
+    """A bool, or a setting or field spelled like one (an empty one is False); raises ValueError otherwise."""
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if not text or text in FALSE_VALUES:
+        return False
+    raise ValueError(f'{value!r} is not true or false')
+
+
+def _in_memory_sqlite(uri: str) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and (
+        url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory')
+
+
+def engine_options(config: Mapping, metrics: 'PoolMetrics' = None, name: str = 'default',
+                   uri: str = None) -> Dict:
+    """
+    Engine options for the database at `uri` (SQLALCHEMY_DATABASE_URI by
+    default) from the DB_POOL_* settings. In-memory SQLite keeps its
+    single-connection pool; everything else gets a sized QueuePool, metered
+    by `metrics` under `name` if given.
+    """
+    options = {
+        'pool_pre_ping': as_bool(config['DB_POOL_PRE_PING']),
+        'pool_recycle': int(config['DB_POOL_RECYCLE']),
+    }
+    if not _in_memory_sqlite(uri or config['SQLALCHEMY_DATABASE_URI']):
+        options.update(
+            pool_size=int(config['DB_POOL_SIZE']),
+            max_overflow=int(config['DB_MAX_OVERFLOW']),
+            pool_timeout=int(config['DB_POOL_TIMEOUT']),
+        )
+        if metrics is not None:
+            options['poolclass'] = metrics.pool_class(name)
+    return options
+
+
+def create_database_on_first_connect(engine, database_name: str) -> None:
+    """
+    Run CREATE DATABASE IF NOT EXISTS through a server-level connection just
+    before `engine` opens its first connection, rather than at import time.
+    """
+    lock = threading.Lock()
+    created = []
+
+    @event.listens_for(engine, 'do_connect')
+    def create_database(dialect, connection_record, cargs, cparams):
+        if created:
+            return
+        with lock:
+            if created:
+                return
+            server_params = {key: value for key, value in cparams.items() if key not in ('database', 'db')}
+            connection = dialect.loaded_dbapi.connect(*cargs, **server_params)
+            try:
+                connection.cursor().execute(f"CREATE DATABASE IF NOT EXISTS `{database_name}`")
+            finally:
+                connection.close()
+            created.append(True)
+
+
+class MeteredQueuePool(QueuePool):
+    """
+    QueuePool that reports how long each checkout took to `metrics`: time
+    spent queueing for a free connection plus opening one under overflow.
+    Subclassed per engine by PoolMetrics.pool_class(), so the pool keeps its
+    reporting name when SQLAlchemy recreates it.
+    """
+    metrics = None
+    metrics_name = 'default'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.metrics is not None:
+            self.metrics.register(self.metrics_name, self)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            self.metrics.observe(self.metrics_name, time.perf_counter() - start, self.checkedout(), timed_out=True)
+            raise
+        self.metrics.observe(self.metrics_name, time.perf_counter() - start, self.checkedout())
+        return connection
+
+
+class _PoolStats:
+    def __init__(self):
+        self.pool = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+        self.peak_checked_out = 0
+
+
+class PoolMetrics:
+    """
+    Checkout wait times and saturation of the connection pools built by
+    `engine_options`, per engine name, for /admin/pool-stats. Saturation is
+    checked-out connections over the most the pool may open (pool_size +
+    max_overflow); near 1.0 requests start queueing for DB_POOL_TIMEOUT.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._pools: Dict[str, _PoolStats] = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['pool_metrics'] = self
+
+    def pool_class(self, name: str = 'default'):
+        return type('MeteredQueuePool', (MeteredQueuePool,), {'metrics': self, 'metrics_name': name})
+
+    def _stats(self, name: str) -> _PoolStats:
+        if name not in self._pools:
+            self._pools[name] = _PoolStats()
+        return self._pools[name]
+
+    def register(self, name: str, pool) -> None:
+        with self._lock:
+            self._stats(name).pool = pool
+
+    def observe(self, name: str, wait: float, checked_out: int, timed_out: bool = False) -> None:
+        with self._lock:
+            stats = self._stats(name)
+            if timed_out:
+                stats.timeouts += 1
+            else:
+                stats.checkouts += 1
+            stats.wait_total += wait
+            stats.wait_max = max(stats.wait_max, wait)
+            stats.wait_buckets[bisect_left(WAIT_BUCKETS, wait)] += 1
+            stats.peak_checked_out = max(stats.peak_checked_out, checked_out)
+
+    def stats(self) -> Dict:
+        result = {}
+        with self._lock:
+            for name, stats in self._pools.items():
+                pool = stats.pool
+                capacity = pool.size() + max(pool._max_overflow, 0) if pool is not None else 0
+                checked_out = pool.checkedout() if pool is not None else 0
+                waits = stats.checkouts + stats.timeouts
+                result[name] = {
+                    'pool_size': pool.size() if pool is not None else 0,
+                    'capacity': capacity,
+                    'checked_out': checked_out,
+                    'idle': pool.checkedin() if pool is not None else 0,
+                    'saturation': checked_out / capacity if capacity else 0.0,
+                    'peak_saturation': stats.peak_checked_out / capacity if capacity else 0.0,
+                    'checkouts': stats.checkouts,
+                    'timeouts': stats.timeouts,
+                    'wait_seconds_total': stats.wait_total,
+                    'wait_seconds_avg': stats.wait_total / waits if waits else 0.0,
+                    'wait_seconds_max': stats.wait_max,
+                    # Cumulative, like a Prometheus histogram: checkouts that waited at most `le` seconds
+                    'wait_buckets': dict(zip([f'le_{bound:g}' for bound in WAIT_BUCKETS] + ['le_inf'],
+                                             accumulate(stats.wait_buckets)))
+                }
+        return result
@@ -0,0 +1,228 @@
+from collections import namedtuple
+import json
+import os
+import tempfile
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, List, Mapping, Optional
+
+import requests
+
+try:
+    import fcntl
+except ImportError:  # Windows development servers run a single process anyway
+    fcntl = None
+
+# Used when neither the shared snapshot, the Currency table nor the API is available
+FALLBACK_RATES = {
+    'GBP': 1.0,
+    'EUR': 1.16,
+    'USD': 1.27
+}
+
+CURRENCY_SYMBOLS = {
+    'GBP': '£',
+    'EUR': '€',
+    'USD': '$'
+}
+
+# `cross` memoizes from/to conversion factors for this snapshot's rates
+RateSnapshot = namedtuple('RateSnapshot', ['rates', 'fetched_at', 'source', 'cross'])
+
+
+def currency_symbol(code: str) -> str:
+    return CURRENCY_SYMBOLS.get(code, f"{code} ")
+
+
+class HttpRateSource:
+    """Fetch GBP-based rates from an exchangerate-api style JSON endpoint."""
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self) -> Dict[str, float]:
+        response = requests.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()['rates']
+
+
+def _validated(rates) -> Optional[Dict[str, float]]:
+    try:
+        rates = {str(code).upper(): float(rate) for code, rate in rates.items()}
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if not rates or any(rate <= 0 for rate in rates.values()):
+        return None
+    rates['GBP'] = 1.0
+    return rates
+
+
+class RateProvider:
+    """
+    Serves the last good exchange-rate snapshot without blocking or locking.
+
+    Each process runs a daemon thread that refreshes the snapshot every
+    `EXCHANGE_RATE_REFRESH_SECONDS`. Snapshots are shared through a JSON file
+    (`EXCHANGE_RATE_SNAPSHOT_PATH`) so only one gunicorn worker, whichever holds
+    the file lock, calls the API per interval; the others pick up its result.
+    Until a fetch succeeds the rates come from the Currency table.
+
+    The HTTP call is made by `source`, any zero-argument callable returning a
+    {code: rate} dict, so tests can swap in a stub.
+    """
+
+    def __init__(self, app=None, source: Optional[Callable[[], Mapping]] = None):
+        self.app = None
+        self.source = source
+        self.interval = 3600
+        self.snapshot_path = None
+        self._snapshot: Optional[RateSnapshot] = None
+        self._thread_pid = None
+        self._start_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EXCHANGE_RATE_URL', 'https://api.exchangerate-api.com/v4/latest/GBP')
+        app.config.setdefault('EXCHANGE_RATE_TIMEOUT', 5)
+        app.config.setdefault('EXCHANGE_RATE_REFRESH_SECONDS', 3600)
+        app.config.setdefault('EXCHANGE_RATE_SNAPSHOT_PATH',
+                              os.path.join(tempfile.gettempdir(), 'hotel_exchange_rates.json'))
+
+        self.app = app
+        self.interval = int(app.config['EXCHANGE_RATE_REFRESH_SECONDS'])
+        self.snapshot_path = app.config['EXCHANGE_RATE_SNAPSHOT_PATH']
+        if self.source is None:
+            self.source = HttpRateSource(app.config['EXCHANGE_RATE_URL'],
+                                         float(app.config['EXCHANGE_RATE_TIMEOUT']))
+
+    # Serving
+
+    def rates(self) -> Mapping[str, float]:
+        """Current GBP-based rates. Never blocks on the network."""
+        self._ensure_started()
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self._seed()
+        return snapshot.rates
+
+    def snapshot(self) -> RateSnapshot:
+        self.rates()
+        return self._snapshot
+
+    def cross_rate(self, from_currency: str, to_currency: str) -> float:
+        """Factor converting `from_currency` amounts to `to_currency`."""
+        rates = self.rates()
+        cross = self._snapshot.cross
+        key = (from_currency, to_currency)
+        factor = cross.get(key)
+        if factor is None:
+            factor = 1.0 if from_currency == to_currency else rates[to_currency] / rates[from_currency]
+            cross[key] = factor
+        return factor
+
+    def convert_many(self, amounts: Iterable[Optional[float]], to_currency: str,
+                     from_currency: str = 'GBP') -> List[Optional[float]]:
+        """
+        Convert a whole list of amounts with one rate lookup, rounded to the
+        2 decimal places every template displays. None passes through.
+        """
+        factor = self.cross_rate(from_currency, to_currency)
+        return [None if amount is None else round(amount * factor, 2) for amount in amounts]
+
+    def _publish(self, rates: Dict[str, float], fetched_at: float, source: str) -> RateSnapshot:
+        snapshot = RateSnapshot(MappingProxyType(dict(rates)), fetched_at, source, {})
+        self._snapshot = snapshot  # single reference swap; readers never see a partial update
+        return snapshot
+
+    def _seed(self) -> RateSnapshot:
+        shared = self._read_shared()
+        if shared is not None:
+            return shared
+        rates = None
+        try:
+            from app import Currency
+            rates = _validated({currency.code: currency.exchange_rate for currency in Currency.query.all()})
+        except Exception as e:
+            self.app.logger.warning(f"Could not seed exchange rates from the database: {str(e)}")
+        if rates:
+            return self._publish(rates, 0.0, 'database')
+        return self._publish(FALLBACK_RATES, 0.0, 'fallback')
+
+    # Shared snapshot file
+
+    def _read_shared(self) -> Optional[RateSnapshot]:
+        try:
+            with open(self.snapshot_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        rates = _validated(data.get('rates', {}))
+        if rates is None:
+            return None
+        current = self._snapshot
+        if current is not None and current.fetched_at >= data.get('fetched_at', 0):
+            return current
+        return self._publish(rates, data.get('fetched_at', 0), 'shared')
+
+    def _write_shared(self, snapshot: RateSnapshot) -> None:
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.rates-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'rates': dict(snapshot.rates), 'fetched_at': snapshot.fetched_at}, f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    # Refreshing
+
+    def refresh(self) -> RateSnapshot:
+        """
+        Bring this process up to date: adopt a fresh shared snapshot if another
+        worker fetched one, otherwise fetch from the source under the file lock.
+        """
+        shared = self._read_shared()
+        if shared is not None and time.time() - shared.fetched_at < self.interval:
+            return shared
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.snapshot_path)), exist_ok=True)
+        with open(self.snapshot_path + '.lock', 'a') as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # Another worker is fetching; use whatever we have meanwhile
+                    return self._snapshot or self._seed()
+            try:
+                rates = _validated(self.source())
+                if rates is None:
+                    raise ValueError('source returned no usable rates')
+                snapshot = self._publish(rates, time.time(), 'api')
+                self._write_shared(snapshot)
+                return snapshot
+            except Exception as e:
+                self.app.logger.warning(f"Exchange rate refresh failed, keeping last good rates: {str(e)}")
+                return self._snapshot or self._seed()
+
+    def _run(self):
+        # Poll more often than the refresh interval so workers adopt a peer's
+        # fresh snapshot promptly; polling is only a file read until it is due
+        poll_seconds = max(1, min(self.interval, 60))
+        while True:
+            try:
+                with self.app.app_context():
+                    self.refresh()
+            except Exception as e:
+                self.app.logger.error(f"Exchange rate refresher error: {str(e)}")
+            time.sleep(poll_seconds)
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so each gunicorn worker starts its own
+        if self._thread_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread_pid == os.getpid():
+                return
+            thread = threading.Thread(target=self._run, name='exchange-rate-refresher', daemon=True)
+            thread.start()
+            self._thread_pid = os.getpid()
@@ -0,0 +1,164 @@
+"""
+Print query plans for the hot bookings and room-night ledger queries without
+and with the indexes declared on the Booking and RoomNight models, on a
+freshly seeded scratch database.
+
+    python explain_booking_queries.py [database_url] [num_bookings]
+
+database_url defaults to an in-memory SQLite database. To see InnoDB plans,
+point it at an empty scratch MySQL schema; the script creates the users,
+hotels, rooms, bookings and room_nights tables there and drops them when done.
+"""
+from datetime import datetime, timedelta
+import random
+import sys
+
+from sqlalchemy import and_, create_engine, func, or_, select, text
+
+from app import db, User, Hotel, Room, Booking, RoomNight
+from inventory import busy_room_ids, stay_nights
+
+TABLES = [User.__table__, Hotel.__table__, Room.__table__, Booking.__table__, RoomNight.__table__]
+ACTIVE_STATUSES = ('confirmed', 'pending')
+STATUSES = ['confirmed'] * 6 + ['pending'] * 2 + ['cancelled'] * 2
+EXPLAIN_PREFIX = {'sqlite': 'EXPLAIN QUERY PLAN ', 'mysql': 'EXPLAIN ', 'postgresql': 'EXPLAIN '}
+ANALYZE = {'sqlite': 'ANALYZE', 'mysql': 'ANALYZE TABLE bookings', 'postgresql': 'ANALYZE bookings'}
+
+
+def seed(conn, num_bookings, rng):
+    num_hotels = max(10, num_bookings // 1000)
+    rooms_per_hotel = 20
+    num_users = max(10, num_bookings // 10)
+    now = datetime.utcnow().replace(microsecond=0)
+
+    conn.execute(Hotel.__table__.insert(), [
+        {'id': hotel_id, 'name': f'Hotel {hotel_id}', 'city': f'City {hotel_id % 17}',
+         'address': f'{hotel_id} High Street', 'description': 'Seeded'}
+        for hotel_id in range(1, num_hotels + 1)
+    ])
+    conn.execute(Room.__table__.insert(), [
+        {'id': room_id, 'hotel_id': (room_id - 1) // rooms_per_hotel + 1,
+         'type': rng.choice(['standard', 'double', 'family']), 'base_price': 100.0, 'price': 100.0}
+        for room_id in range(1, num_hotels * rooms_per_hotel + 1)
+    ])
+    conn.execute(User.__table__.insert(), [
+        {'id': user_id, 'username': f'user{user_id}', 'email': f'user{user_id}@example.com',
+         'password_hash': 'x'}
+        for user_id in range(1, num_users + 1)
+    ])
+
+    rows = []
+    held = {}
+    for booking_id in range(1, num_bookings + 1):
+        room_id = rng.randint(1, num_hotels * rooms_per_hotel)
+        booking_date = now - timedelta(days=rng.randint(0, 730))
+        check_in = booking_date + timedelta(days=rng.randint(1, 120))
+        rows.append({
+            'id': booking_id, 'booking_id': f'BK{booking_id:010d}',
+            'user_id': rng.randint(1, num_users), 'hotel_id': (room_id - 1) // rooms_per_hotel + 1,
+            'room_id': room_id, 'check_in': check_in,
+            'check_out': check_in + timedelta(days=rng.randint(1, 14)),
+            'guests': 2, 'total_price': rng.uniform(80, 2000), 'status': rng.choice(STATUSES),
+            'payment_status': 'paid', 'booking_date': booking_date, 'created_at': booking_date
+        })
+        # The ledger as backfill_ledger() builds it: the first booking holds a night
+        booking = rows[-1]
+        if booking['status'] in ACTIVE_STATUSES:
+            for night in stay_nights(booking['check_in'], booking['check_out']):
+                held.setdefault((room_id, night), booking_id)
+        if len(rows) == 5000:
+            conn.execute(Booking.__table__.insert(), rows)
+            rows = []
+    if rows:
+        conn.execute(Booking.__table__.insert(), rows)
+    nights = [{'room_id': room_id, 'night': night, 'booking_id': booking_id}
+              for (room_id, night), booking_id in held.items()]
+    for start in range(0, len(nights), 5000):
+        conn.execute(RoomNight.__table__.insert(), nights[start:start + 5000])
+
+
+def queries():
+    """The bookings and ledger statements the routes and reports run, with representative values."""
+    now = datetime.utcnow().replace(microsecond=0)
+    check_in = now + timedelta(days=30)
+    check_out = check_in + timedelta(days=3)
+    month_ago = now - timedelta(days=30)
+    # Where the previous profile page ended, as keyset_page() continues from a cursor
+    last_check_in, last_id = now + timedelta(days=10), 1000
+    return [
+        ("booking(): inventory.is_room_free (ledger)", busy_room_ids(check_in, check_out, [7]).limit(1)),
+        ("search_hotels(): busy rooms (ledger)", busy_room_ids(check_in, check_out)),
+        ("sync_booking_nights(): a booking's nights (ledger)", select(RoomNight.night).where(
+            RoomNight.booking_id == 1234
+        )),
+        ("profile_bookings(): upcoming, next page", select(Booking.id).where(
+            Booking.user_id == 42,
+            Booking.check_in >= now,
+            or_(Booking.check_in > last_check_in, and_(Booking.check_in == last_check_in, Booking.id > last_id))
+        ).order_by(Booking.check_in, Booking.id).limit(21)),
+        ("profile_bookings(): past, next page", select(Booking.id).where(
+            Booking.user_id == 42,
+            Booking.check_in < now,
+            or_(Booking.check_in < month_ago, and_(Booking.check_in == month_ago, Booking.id < last_id))
+        ).order_by(Booking.check_in.desc(), Booking.id.desc()).limit(21)),
+        ("occupancy: hotel stays", select(Booking.hotel_id, Booking.check_in, Booking.check_out).where(
+            Booking.hotel_id.in_([3, 4, 5]),
+            Booking.status.in_(ACTIVE_STATUSES),
+            Booking.check_in < check_out,
+            Booking.check_out > check_in
+        )),
+        ("hotel_performance(): one hotel", select(func.count(Booking.id), func.sum(Booking.total_price)).where(
+            Booking.hotel_id == 3,
+            Booking.booking_date.between(month_ago, now)
+        )),
+        ("admin_export_bookings(): booking_date range", select(Booking.id).where(
+            Booking.booking_date >= month_ago,
+            Booking.booking_date < now
+        ).order_by(Booking.id)),
+        ("dashboard: recent bookings", select(Booking.id).order_by(Booking.created_at.desc()).limit(5)),
+    ]
+
+
+def explain(conn, statement):
+    dialect = conn.dialect.name
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+    return conn.exec_driver_sql(EXPLAIN_PREFIX.get(dialect, 'EXPLAIN ') + sql).fetchall()
+
+
+def print_plans(conn, title):
+    print(f"\n=== {title} ===")
+    for name, statement in queries():
+        print(f"\n-- {name}")
+        for row in explain(conn, statement):
+            print('   ' + ' | '.join('' if value is None else str(value) for value in row))
+
+
+def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else 'sqlite://'
+    num_bookings = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    engine = create_engine(url)
+    analyze = ANALYZE.get(engine.dialect.name)
+    indexes = sorted(Booking.__table__.indexes | RoomNight.__table__.indexes, key=lambda index: index.name)
+
+    db.metadata.create_all(engine, tables=TABLES)
+    try:
+        with engine.begin() as conn:
+            for index in indexes:
+                index.drop(conn)
+            seed(conn, num_bookings, random.Random(42))
+            if analyze:
+                conn.execute(text(analyze))
+            print(f"Seeded {num_bookings} bookings")
+            print_plans(conn, "Without secondary indexes")
+
+            for index in indexes:
+                index.create(conn)
+            if analyze:
+                conn.execute(text(analyze))
+            print_plans(conn, "With " + ", ".join(index.name for index in indexes))
+    finally:
+        db.metadata.drop_all(engine, tables=TABLES)
+
+
+if __name__ == '__main__':
+    main()
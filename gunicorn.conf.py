@@ -0,0 +1,19 @@
+import os
+import shutil
+import tempfile
+
+# Workers write their Prometheus samples here and /metrics sums them
+# (request_metrics.py). Set before any worker imports prometheus_client.
+metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                                    os.path.join(tempfile.gettempdir(), 'hotel_prometheus'))
+
+
+def on_starting(server):
+    # Samples left by a previous run would otherwise be added to this one's
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -13,6 +13,7 @@ import requests
 from itertools import groupby
 import uuid
 from flask_migrate import Migrate
+from pricing import stay_price
 
 app = Flask(__name__)
 
@@ -156,37 +157,7 @@ class Room(db.Model):
 
     def calculate_price(self, check_in, check_out):
         """Calculate total price for the room booking."""
-        if isinstance(check_in, str):
-            check_in = datetime.strptime(check_in, '%Y-%m-%d').date()
-        if isinstance(check_out, str):
-            check_out = datetime.strptime(check_out, '%Y-%m-%d').date()
-        
-        nights = (check_out - check_in).days
-        if nights <= 0:
-            return None
-        
-        total_price = 0
-        current_date = check_in
-        
-        while current_date < check_out:
-            # Check if it's weekend (Friday or Saturday)
-            is_weekend = current_date.weekday() >= 5
-            # Check if it's peak season
-            is_peak = current_date.month in [4, 5, 6, 7, 8, 11, 12]
-            
-            if is_peak:
-                day_price = self.peak_price
-            else:
-                day_price = self.base_price
-            
-            # Apply weekend surcharge
-            if is_weekend:
-                day_price *= 1.2
-            
-            total_price += day_price
-            current_date += timedelta(days=1)
-        
-        return total_price
+        return stay_price(self.base_price, self.peak_price, check_in, check_out)
 
 class Booking(db.Model):
     __tablename__ = 'bookings'
@@ -236,12 +207,6 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def is_peak_season(date):
-    """Check if a given date falls in peak season (April-August and November-December)"""
-    if isinstance(date, str):
-        date = datetime.strptime(date, '%Y-%m-%d').date()
-    return date.month in [4, 5, 6, 7, 8, 11, 12]
-
 @app.route('/')
 def index():
     form = SearchForm()
@@ -45,7 +45,9 @@ def create_database():
                 rating FLOAT DEFAULT 0.0,
                 amenities JSON,
                 images JSON,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                INDEX ix_hotels_name (name),
+                INDEX ix_hotels_city_name (city, name)
             ) ENGINE=InnoDB
             """
             
@@ -63,6 +65,7 @@ def create_database():
                 images JSON,
                 available BOOLEAN DEFAULT TRUE,
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                INDEX ix_rooms_hotel_type (hotel_id, type),
                 FOREIGN KEY (hotel_id) REFERENCES hotels(id)
             ) ENGINE=InnoDB
             """
@@ -84,12 +87,77 @@ def create_database():
                 booking_date DATETIME DEFAULT CURRENT_TIMESTAMP,
                 advance_booking_discount FLOAT DEFAULT 0,
                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                INDEX ix_bookings_hotel_status (hotel_id, status, booking_date),
+                INDEX ix_bookings_user_check_in (user_id, check_in),
+                INDEX ix_bookings_booking_date (booking_date),
+                INDEX ix_bookings_created_at (created_at),
                 FOREIGN KEY (user_id) REFERENCES users(id),
                 FOREIGN KEY (hotel_id) REFERENCES hotels(id),
                 FOREIGN KEY (room_id) REFERENCES rooms(id)
             ) ENGINE=InnoDB
             """
             
+            tables['room_nights'] = """
+            CREATE TABLE IF NOT EXISTS room_nights (
+                room_id INT NOT NULL,
+                night DATE NOT NULL,
+                booking_id INT NOT NULL,
+                PRIMARY KEY (room_id, night),
+                INDEX ix_room_nights_booking_id (booking_id),
+                FOREIGN KEY (room_id) REFERENCES rooms(id),
+                FOREIGN KEY (booking_id) REFERENCES bookings(id)
+            ) ENGINE=InnoDB
+            """
+            
+            tables['room_price_calendar'] = """
+            CREATE TABLE IF NOT EXISTS room_price_calendar (
+                room_id INT NOT NULL,
+                night DATE NOT NULL,
+                price FLOAT NOT NULL,
+                cumulative FLOAT NOT NULL,
+                PRIMARY KEY (room_id, night),
+                FOREIGN KEY (room_id) REFERENCES rooms(id)
+            ) ENGINE=InnoDB
+            """
+            
+            tables['revenue_daily'] = """
+            CREATE TABLE IF NOT EXISTS revenue_daily (
+                hotel_id INT NOT NULL,
+                day DATE NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                room_type VARCHAR(50) NOT NULL DEFAULT '',
+                bookings INT NOT NULL DEFAULT 0,
+                revenue FLOAT NOT NULL DEFAULT 0,
+                PRIMARY KEY (hotel_id, day, status, room_type),
+                FOREIGN KEY (hotel_id) REFERENCES hotels(id)
+            ) ENGINE=InnoDB
+            """
+            
+            tables['customer_revenue'] = """
+            CREATE TABLE IF NOT EXISTS customer_revenue (
+                user_id INT NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                bookings INT NOT NULL DEFAULT 0,
+                revenue FLOAT NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, status),
+                FOREIGN KEY (user_id) REFERENCES users(id)
+            ) ENGINE=InnoDB
+            """
+            
+            tables['sales_reports'] = """
+            CREATE TABLE IF NOT EXISTS sales_reports (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                hotel_id INT NOT NULL,
+                month DATE NOT NULL,
+                total_sales FLOAT DEFAULT 0,
+                total_bookings INT DEFAULT 0,
+                average_rating FLOAT DEFAULT 0,
+                profit FLOAT DEFAULT 0,
+                UNIQUE KEY uq_sales_reports_hotel_month (hotel_id, month),
+                FOREIGN KEY (hotel_id) REFERENCES hotels(id)
+            ) ENGINE=InnoDB
+            """
+            
             tables['currencies'] = """
             CREATE TABLE IF NOT EXISTS currencies (
                 id INT AUTO_INCREMENT PRIMARY KEY,
@@ -0,0 +1,151 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Bookings in these states hold their room for the stay dates
+ACTIVE_BOOKING_STATUSES = ('confirmed', 'pending')
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def stay_nights(check_in, check_out) -> Iterator[date]:
+    """Yield each night of a stay, check-in inclusive and check-out exclusive."""
+    night = _as_date(check_in)
+    last = _as_date(check_out)
+    while night < last:
+        yield night
+        night += timedelta(days=1)
+
+
+def holds_inventory(booking) -> bool:
+    """Check if a booking should keep its room-nights out of inventory."""
+    return booking.status in ACTIVE_BOOKING_STATUSES and booking.payment_status != 'cancelled'
+
+
+def busy_room_ids(check_in, check_out, room_ids=None):
+    """Select of room ids with at least one held night in [check_in, check_out)."""
+    from app import db, RoomNight
+
+    query = db.select(RoomNight.room_id).where(
+        RoomNight.night >= _as_date(check_in),
+        RoomNight.night < _as_date(check_out)
+    )
+    if room_ids is not None:
+        query = query.where(RoomNight.room_id.in_(room_ids))
+    return query.distinct()
+
+
+def is_room_free(room_id: int, check_in, check_out) -> bool:
+    """Check if a room has no held nights in [check_in, check_out)."""
+    from app import db
+
+    held = db.session.execute(busy_room_ids(check_in, check_out, [room_id]).limit(1)).first()
+    return held is None
+
+
+def free_room_count(hotel_id: int, room_type: str, check_in, check_out) -> int:
+    """Count rooms of a type in a hotel with no held nights in [check_in, check_out)."""
+    from app import db, Room
+
+    rooms_of_type = db.select(Room.id).where(Room.hotel_id == hotel_id, Room.type == room_type)
+    return db.session.execute(
+        db.select(db.func.count(Room.id)).where(
+            Room.id.in_(rooms_of_type),
+            Room.id.not_in(busy_room_ids(check_in, check_out, rooms_of_type))
+        )
+    ).scalar()
+
+
+def sync_booking_nights(booking) -> None:
+    """
+    Bring the ledger in line with a booking's current state. Call after every
+    status change (created, confirmed, cancelled, expired); the booking must
+    have been flushed so it has an id. Commit is left to the caller.
+    """
+    from app import db, RoomNight
+
+    db.session.execute(db.delete(RoomNight).where(RoomNight.booking_id == booking.id))
+    if holds_inventory(booking):
+        db.session.add_all([
+            RoomNight(room_id=booking.room_id, night=night, booking_id=booking.id)
+            for night in stay_nights(booking.check_in, booking.check_out)
+        ])
+    db.session.flush()
+
+
+def _expected_nights() -> Tuple[Dict, List[Dict]]:
+    """Build the (room_id, night) -> booking_id map implied by the bookings table."""
+    from app import db, Booking
+
+    expected = {}
+    conflicts = []
+    bookings = db.session.execute(
+        db.select(Booking.id, Booking.room_id, Booking.check_in, Booking.check_out).where(
+            Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+            Booking.payment_status != 'cancelled'
+        ).order_by(Booking.id).execution_options(yield_per=1000)
+    )
+    for booking_id, room_id, check_in, check_out in bookings:
+        for night in stay_nights(check_in, check_out):
+            key = (room_id, night)
+            if key in expected:
+                conflicts.append({'room_id': room_id, 'night': night.isoformat(),
+                                  'booking_id': booking_id, 'held_by': expected[key]})
+                continue
+            expected[key] = booking_id
+    return expected, conflicts
+
+
+def backfill_ledger(batch_size: int = 1000) -> Dict:
+    """
+    Rebuild the room-night ledger from existing bookings. Overlapping active
+    bookings cannot both hold a night; the later booking is reported as a
+    conflict and left out.
+    """
+    from app import db, RoomNight
+
+    expected, conflicts = _expected_nights()
+    db.session.execute(db.delete(RoomNight))
+
+    rows = [{'room_id': room_id, 'night': night, 'booking_id': booking_id}
+            for (room_id, night), booking_id in expected.items()]
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(db.insert(RoomNight), rows[start:start + batch_size])
+    db.session.commit()
+
+    return {'nights': len(rows), 'conflicts': conflicts}
+
+
+def check_ledger(limit: Optional[int] = 20) -> Dict:
+    """
+    Compare the ledger against the bookings table. Reports nights that are
+    missing, held by the wrong booking, or held with no active booking.
+    """
+    from app import db, RoomNight
+
+    expected, conflicts = _expected_nights()
+    actual = {
+        (room_id, night): booking_id
+        for room_id, night, booking_id in db.session.execute(
+            db.select(RoomNight.room_id, RoomNight.night, RoomNight.booking_id)
+        )
+    }
+
+    def describe(keys, source):
+        return [{'room_id': room_id, 'night': night.isoformat(), 'booking_id': source[(room_id, night)]}
+                for room_id, night in sorted(keys)[:limit]]
+
+    missing = expected.keys() - actual.keys()
+    orphaned = actual.keys() - expected.keys()
+    mismatched = [key for key in expected.keys() & actual.keys() if expected[key] != actual[key]]
+
+    return {
+        'consistent': not (missing or orphaned or mismatched),
+        'missing': describe(missing, expected),
+        'orphaned': describe(orphaned, actual),
+        'mismatched': describe(mismatched, actual),
+        'conflicts': conflicts[:limit]
+    }
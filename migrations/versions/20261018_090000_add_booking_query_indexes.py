@@ -0,0 +1,113 @@
+"""add booking query indexes; create the room-night ledger and price calendar
+
+Revision ID: 4c2d8f1a9b37
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c2d8f1a9b37'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_bookings_room_stay', ['room_id', 'check_in', 'check_out']),
+    ('ix_bookings_hotel_status', ['hotel_id', 'status', 'booking_date']),
+    ('ix_bookings_user_check_in', ['user_id', 'check_in']),
+    ('ix_bookings_booking_date', ['booking_date']),
+]
+# Matches inventory.ACTIVE_BOOKING_STATUSES
+ACTIVE_BOOKING_STATUSES = ('confirmed', 'pending')
+
+bookings = sa.table(
+    'bookings',
+    sa.column('id', sa.Integer()),
+    sa.column('room_id', sa.Integer()),
+    sa.column('check_in', sa.DateTime()),
+    sa.column('check_out', sa.DateTime()),
+    sa.column('status', sa.String()),
+    sa.column('payment_status', sa.String()),
+)
+
+
+def _existing_indexes():
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('bookings')}
+
+
+def _existing_tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def _create_room_nights():
+    room_nights = op.create_table(
+        'room_nights',
+        sa.Column('room_id', sa.Integer(), sa.ForeignKey('rooms.id'), nullable=False),
+        sa.Column('night', sa.Date(), nullable=False),
+        sa.Column('booking_id', sa.Integer(), sa.ForeignKey('bookings.id'), nullable=False),
+        sa.PrimaryKeyConstraint('room_id', 'night'),
+    )
+    op.create_index('ix_room_nights_booking_id', 'room_nights', ['booking_id'])
+
+    # Fill the ledger as inventory.backfill_ledger() would: the earliest of
+    # overlapping active bookings holds the night, and `flask check-ledger`
+    # lists the others
+    held = {}
+    active = op.get_bind().execute(
+        sa.select(bookings.c.id, bookings.c.room_id, bookings.c.check_in, bookings.c.check_out).where(
+            bookings.c.status.in_(ACTIVE_BOOKING_STATUSES),
+            sa.or_(bookings.c.payment_status.is_(None), bookings.c.payment_status != 'cancelled')
+        ).order_by(bookings.c.id))
+    for booking_id, room_id, check_in, check_out in active:
+        night = check_in.date() if isinstance(check_in, datetime) else check_in
+        last = check_out.date() if isinstance(check_out, datetime) else check_out
+        while night < last:
+            held.setdefault((room_id, night), booking_id)
+            night += timedelta(days=1)
+    if held:
+        op.bulk_insert(room_nights, [{'room_id': room_id, 'night': night, 'booking_id': booking_id}
+                                     for (room_id, night), booking_id in held.items()])
+
+
+def _create_room_price_calendar():
+    # Left empty: search prices rooms without calendar rows from the pricing
+    # rules, and `flask refresh-price-calendar` fills the booking window
+    op.create_table(
+        'room_price_calendar',
+        sa.Column('room_id', sa.Integer(), sa.ForeignKey('rooms.id'), nullable=False),
+        sa.Column('night', sa.Date(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('cumulative', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('room_id', 'night'),
+    )
+
+
+def upgrade():
+    # Databases created by db.create_all() or init_mysql.py already have them
+    existing = _existing_indexes()
+    for name, columns in INDEXES:
+        if name not in existing:
+            op.create_index(name, 'bookings', columns)
+
+    # The ledger and calendar came before migrations and were only ever made
+    # by db.create_all() or init_mysql.py
+    tables = _existing_tables()
+    if 'room_nights' not in tables:
+        _create_room_nights()
+    if 'room_price_calendar' not in tables:
+        _create_room_price_calendar()
+
+
+def downgrade():
+    # The ledger and calendar are left in place: they predate this revision
+    # on every database created by db.create_all() or init_mysql.py
+    existing = _existing_indexes()
+    for name, columns in reversed(INDEXES):
+        if name in existing:
+            op.drop_index(name, table_name='bookings')
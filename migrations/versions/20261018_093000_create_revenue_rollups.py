@@ -0,0 +1,61 @@
+"""create the daily and per-customer revenue rollups
+
+Revision ID: e5c81f3a6d49
+Revises: 4c2d8f1a9b37
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c81f3a6d49'
+down_revision = '4c2d8f1a9b37'
+branch_labels = None
+depends_on = None
+
+
+def _existing_tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade():
+    # Admin reports read these instead of scanning bookings (revenue_rollup.py).
+    # Databases created by db.create_all() or init_mysql.py already have them
+    tables = _existing_tables()
+    if 'revenue_daily' not in tables:
+        op.create_table(
+            'revenue_daily',
+            sa.Column('hotel_id', sa.Integer(), sa.ForeignKey('hotels.id'), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('bookings', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('revenue', sa.Float(), nullable=False, server_default='0'),
+            sa.PrimaryKeyConstraint('hotel_id', 'day', 'status'),
+        )
+        # Filled as RevenueRollup.rebuild() would
+        op.execute(
+            "INSERT INTO revenue_daily (hotel_id, day, status, bookings, revenue) "
+            "SELECT b.hotel_id, DATE(b.created_at), b.status, COUNT(b.id), COALESCE(SUM(b.total_price), 0) "
+            "FROM bookings b GROUP BY b.hotel_id, DATE(b.created_at), b.status")
+    if 'customer_revenue' not in tables:
+        op.create_table(
+            'customer_revenue',
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('bookings', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('revenue', sa.Float(), nullable=False, server_default='0'),
+            sa.PrimaryKeyConstraint('user_id', 'status'),
+        )
+        op.execute(
+            "INSERT INTO customer_revenue (user_id, status, bookings, revenue) "
+            "SELECT b.user_id, b.status, COUNT(b.id), COALESCE(SUM(b.total_price), 0) "
+            "FROM bookings b GROUP BY b.user_id, b.status")
+
+
+def downgrade():
+    tables = _existing_tables()
+    for table in ('customer_revenue', 'revenue_daily'):
+        if table in tables:
+            op.drop_table(table)
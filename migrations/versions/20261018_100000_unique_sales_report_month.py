@@ -0,0 +1,31 @@
+"""unique sales report per hotel and month
+
+Revision ID: 8e1f5a3c7d20
+Revises: e5c81f3a6d49
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e1f5a3c7d20'
+down_revision = 'e5c81f3a6d49'
+branch_labels = None
+depends_on = None
+
+
+def _existing_indexes():
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('sales_reports')}
+
+
+def upgrade():
+    # Reports are now upserted per (hotel_id, month) by sales_reports.build_sales_reports
+    if 'uq_sales_reports_hotel_month' not in _existing_indexes():
+        op.create_index('uq_sales_reports_hotel_month', 'sales_reports', ['hotel_id', 'month'], unique=True)
+
+
+def downgrade():
+    if 'uq_sales_reports_hotel_month' in _existing_indexes():
+        op.drop_index('uq_sales_reports_hotel_month', table_name='sales_reports')
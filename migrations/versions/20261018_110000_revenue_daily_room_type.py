@@ -0,0 +1,64 @@
+"""room type dimension on the daily revenue rollup
+
+Revision ID: 2b9d4e6f8a13
+Revises: 8e1f5a3c7d20
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b9d4e6f8a13'
+down_revision = '8e1f5a3c7d20'
+branch_labels = None
+depends_on = None
+
+
+def _existing_columns():
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns('revenue_daily')}
+
+
+def _recreate(with_room_type):
+    # The key changes, so rebuild the table and refill it from bookings,
+    # exactly as RevenueRollup.rebuild() would
+    op.drop_table('revenue_daily')
+    key = ['hotel_id', 'day', 'status'] + (['room_type'] if with_room_type else [])
+    columns = [
+        sa.Column('hotel_id', sa.Integer(), sa.ForeignKey('hotels.id'), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+    ]
+    if with_room_type:
+        columns.append(sa.Column('room_type', sa.String(length=50), nullable=False, server_default=''))
+    columns += [
+        sa.Column('bookings', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('revenue', sa.Float(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint(*key),
+    ]
+    op.create_table('revenue_daily', *columns)
+
+    if with_room_type:
+        op.execute(
+            "INSERT INTO revenue_daily (hotel_id, day, status, room_type, bookings, revenue) "
+            "SELECT b.hotel_id, DATE(b.created_at), b.status, COALESCE(r.type, ''), COUNT(b.id), "
+            "COALESCE(SUM(b.total_price), 0) "
+            "FROM bookings b LEFT JOIN rooms r ON r.id = b.room_id "
+            "GROUP BY b.hotel_id, DATE(b.created_at), b.status, COALESCE(r.type, '')")
+    else:
+        op.execute(
+            "INSERT INTO revenue_daily (hotel_id, day, status, bookings, revenue) "
+            "SELECT b.hotel_id, DATE(b.created_at), b.status, COUNT(b.id), COALESCE(SUM(b.total_price), 0) "
+            "FROM bookings b GROUP BY b.hotel_id, DATE(b.created_at), b.status")
+
+
+def upgrade():
+    # Report series can now be split by room type (revenue_series.py)
+    if 'room_type' not in _existing_columns():
+        _recreate(with_room_type=True)
+
+
+def downgrade():
+    if 'room_type' in _existing_columns():
+        _recreate(with_room_type=False)
@@ -0,0 +1,39 @@
+"""indexes for the admin hotel and room listings
+
+Revision ID: d47a1c9e5b62
+Revises: 2b9d4e6f8a13
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd47a1c9e5b62'
+down_revision = '2b9d4e6f8a13'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('hotels', 'ix_hotels_name', ['name']),
+    ('hotels', 'ix_hotels_city_name', ['city', 'name']),
+    ('rooms', 'ix_rooms_hotel_type', ['hotel_id', 'type']),
+]
+
+
+def _existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # Databases created by db.create_all() or init_mysql.py already have them
+    for table, name, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for table, name, columns in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
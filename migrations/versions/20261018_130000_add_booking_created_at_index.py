@@ -0,0 +1,31 @@
+"""index bookings.created_at for the dashboard's recent bookings
+
+Revision ID: 6a3e9b1d2f84
+Revises: d47a1c9e5b62
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a3e9b1d2f84'
+down_revision = 'd47a1c9e5b62'
+branch_labels = None
+depends_on = None
+
+
+def _existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # Databases created by db.create_all() or init_mysql.py already have it
+    if 'ix_bookings_created_at' not in _existing_indexes('bookings'):
+        op.create_index('ix_bookings_created_at', 'bookings', ['created_at'])
+
+
+def downgrade():
+    if 'ix_bookings_created_at' in _existing_indexes('bookings'):
+        op.drop_index('ix_bookings_created_at', table_name='bookings')
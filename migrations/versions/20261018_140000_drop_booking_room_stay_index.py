@@ -0,0 +1,31 @@
+"""drop the unused bookings (room_id, check_in, check_out) index
+
+Revision ID: 3d7a0e5c9b18
+Revises: 6a3e9b1d2f84
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d7a0e5c9b18'
+down_revision = '6a3e9b1d2f84'
+branch_labels = None
+depends_on = None
+
+
+def _existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # Room overlap checks read the room_nights ledger, so no query uses it
+    if 'ix_bookings_room_stay' in _existing_indexes('bookings'):
+        op.drop_index('ix_bookings_room_stay', table_name='bookings')
+
+
+def downgrade():
+    if 'ix_bookings_room_stay' not in _existing_indexes('bookings'):
+        op.create_index('ix_bookings_room_stay', 'bookings', ['room_id', 'check_in', 'check_out'])
@@ -5,6 +5,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 import enum
 import uuid
 from sqlalchemy import extract
+from pricing import stay_price
 
 db = SQLAlchemy()
 
@@ -87,23 +88,7 @@ class Room(db.Model):
     def calculate_price(self, check_in, check_out):
         """Calculate total price for the room booking."""
         try:
-            if isinstance(check_in, str):
-                check_in = datetime.strptime(check_in, '%Y-%m-%d').date()
-            if isinstance(check_out, str):
-                check_out = datetime.strptime(check_out, '%Y-%m-%d').date()
-            
-            # Calculate number of nights
-            nights = (check_out - check_in).days
-            if nights <= 0:
-                return None
-            
-            # Check if dates are in peak season
-            is_peak = check_in.month in [4, 5, 6, 7, 8, 11, 12]
-            
-            # Use peak price during peak season if available
-            daily_rate = self.peak_price if (is_peak and self.peak_price) else self.base_price
-            
-            return daily_rate * nights
+            return stay_price(self.base_price, self.peak_price, check_in, check_out)
         except Exception as e:
             print(f"Error calculating price: {str(e)}")
             return None
@@ -182,7 +167,3 @@ class Currency(db.Model):
         self.last_updated = datetime.utcnow()
         db.session.commit()
 
-def is_peak_season(date):
-    """Check if a given date falls in peak season (April-August and November-December)"""
-    month = date.month
-    return month in [4, 5, 6, 7, 8, 11, 12]
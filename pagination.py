@@ -0,0 +1,80 @@
+import base64
+from datetime import date, datetime
+import json
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(column, value):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, keys: Sequence) -> List:
+    """Decode a cursor produced by `encode_cursor` for the same `keys`; raises InvalidCursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise InvalidCursor('cursor does not match the sort keys')
+        return [_decode_value(key, value) for key, value in zip(keys, values)]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e)) from e
+
+
+def _after(keys: Sequence, values: Sequence, descending: bool):
+    # (k1, k2, ...) > (v1, v2, ...) expanded, since MySQL does not use indexes
+    # for row-value comparisons
+    clauses = []
+    for position, key in enumerate(keys):
+        equal = [keys[i] == values[i] for i in range(position)]
+        beyond = key < values[position] if descending else key > values[position]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
+
+
+def keyset_page(statement, keys: Sequence, cursor: Optional[str] = None, per_page: int = 20,
+                descending: bool = False, session=None) -> Tuple[List, Optional[str]]:
+    """
+    One page of ORM entities from `statement`, ordered by `keys` (whose
+    combined values must be unique; end with the primary key) and starting
+    after `cursor`. Returns (items, next_cursor); next_cursor is None on the
+    last page. Cost is independent of how deep the page is, unlike OFFSET.
+    """
+    if session is None:
+        from app import db
+        session = db.session
+
+    if cursor:
+        statement = statement.where(_after(keys, decode_cursor(cursor, keys), descending))
+    order = [key.desc() if descending else key.asc() for key in keys]
+    items = list(session.execute(statement.order_by(*order).limit(per_page + 1)).unique().scalars())
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, key.key) for key in keys])
+    return items, next_cursor
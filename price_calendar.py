@@ -0,0 +1,105 @@
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from pricing import night_price
+
+# Matches the booking window advertised by booking() via max_date
+CALENDAR_DAYS = 365
+
+
+def _calendar_rows(room, start: date, end: date, cumulative: float = 0.0) -> List[Dict]:
+    """Rows for nights [start, end]; `cumulative` is the running total before `start`."""
+    rows = []
+    night = start
+    while night <= end:
+        price = night_price(room.base_price, room.peak_price, night)
+        rows.append({'room_id': room.id, 'night': night, 'price': price, 'cumulative': cumulative})
+        cumulative += price
+        night += timedelta(days=1)
+    return rows
+
+
+def _window(today: Optional[date] = None):
+    today = today or date.today()
+    # One extra row so a stay checking out on the last bookable day has an end point
+    return today, today + timedelta(days=CALENDAR_DAYS)
+
+
+def refresh_room_calendar(room) -> None:
+    """Rebuild one room's calendar, e.g. after an admin changes its prices. Commit is left to the caller."""
+    from app import db, RoomPriceNight
+
+    start, end = _window()
+    db.session.execute(db.delete(RoomPriceNight).where(RoomPriceNight.room_id == room.id))
+    db.session.execute(db.insert(RoomPriceNight), _calendar_rows(room, start, end))
+
+
+def refresh_calendar(batch_size: int = 5000) -> Dict:
+    """
+    Roll every room's calendar forward to today's window: drop past nights and
+    append the nights that have come into range, continuing each room's running
+    total. Rooms without a calendar are built from scratch.
+    """
+    from app import db, Room, RoomPriceNight
+
+    start, end = _window()
+    db.session.execute(db.delete(RoomPriceNight).where(RoomPriceNight.night < start))
+
+    last_night = db.select(
+        RoomPriceNight.room_id, db.func.max(RoomPriceNight.night).label('night')
+    ).group_by(RoomPriceNight.room_id).subquery()
+    tails = {
+        room_id: (night, price, cumulative)
+        for room_id, night, price, cumulative in db.session.execute(
+            db.select(RoomPriceNight.room_id, RoomPriceNight.night,
+                      RoomPriceNight.price, RoomPriceNight.cumulative).join(
+                last_night, db.and_(RoomPriceNight.room_id == last_night.c.room_id,
+                                    RoomPriceNight.night == last_night.c.night))
+        )
+    }
+
+    rows = []
+    appended = 0
+    for room in db.session.execute(db.select(Room)).scalars():
+        tail = tails.get(room.id)
+        if tail is None:
+            rows.extend(_calendar_rows(room, start, end))
+        elif tail[0] < end:
+            night, price, cumulative = tail
+            rows.extend(_calendar_rows(room, night + timedelta(days=1), end, cumulative + price))
+        if len(rows) >= batch_size:
+            db.session.execute(db.insert(RoomPriceNight), rows)
+            appended += len(rows)
+            rows = []
+    if rows:
+        db.session.execute(db.insert(RoomPriceNight), rows)
+        appended += len(rows)
+    db.session.commit()
+
+    return {'window_start': start.isoformat(), 'window_end': end.isoformat(), 'nights_added': appended}
+
+
+def stay_totals(room_ids: Iterable[int], check_in: date, check_out: date) -> Dict[int, float]:
+    """
+    Stay totals from calendar prefix sums: two row lookups per room regardless
+    of stay length. Rooms without calendar rows for both dates are omitted.
+    """
+    from app import db, RoomPriceNight
+
+    room_ids = list(room_ids)
+    if not room_ids:
+        return {}
+    rows = db.session.execute(
+        db.select(RoomPriceNight.room_id, RoomPriceNight.night, RoomPriceNight.cumulative).where(
+            RoomPriceNight.room_id.in_(room_ids),
+            RoomPriceNight.night.in_([check_in, check_out])
+        )
+    )
+    bounds = {}
+    for room_id, night, cumulative in rows:
+        bounds.setdefault(room_id, {})[night] = cumulative
+    return {
+        room_id: round(nights[check_out] - nights[check_in], 2)
+        for room_id, nights in bounds.items()
+        if check_in in nights and check_out in nights
+    }
@@ -0,0 +1,160 @@
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+PEAK_MONTHS = frozenset([4, 5, 6, 7, 8, 11, 12])
+WEEKEND_DAYS = frozenset([5, 6])  # Saturday and Sunday nights
+WEEKEND_MULTIPLIER = 1.2
+# Applied to base_price in peak season when a room has no peak_price
+PEAK_FALLBACK_MULTIPLIER = 1.3
+
+# (minimum days before check-in, rate, reason)
+ADVANCE_BOOKING_TIERS = [
+    (61, 0.15, "15% discount for booking more than 60 days in advance"),
+    (31, 0.10, "10% discount for booking more than 30 days in advance"),
+    (0, 0.0, "No advance booking discount applicable")
+]
+CANCELLATION_TIERS = [
+    (61, 0.0, "No cancellation charge for cancellations over 60 days before check-in"),
+    (30, 0.5, "50% cancellation charge for cancellations 30-60 days before check-in"),
+    (0, 1.0, "100% cancellation charge for cancellations within 30 days of check-in")
+]
+
+
+def _as_date(value) -> date:
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+class PricingRules:
+    """
+    The pricing policy used everywhere in the application: seasonality,
+    weekend uplift, advance-booking discounts and cancellation charges.
+    Compiled once into lookup tables (month -> peak, weekday -> weekend,
+    days before check-in -> tier) so hot paths only index into tuples.
+    """
+
+    def __init__(self, peak_months=PEAK_MONTHS, weekend_days=WEEKEND_DAYS,
+                 weekend_multiplier=WEEKEND_MULTIPLIER, peak_fallback_multiplier=PEAK_FALLBACK_MULTIPLIER,
+                 advance_tiers=ADVANCE_BOOKING_TIERS, cancellation_tiers=CANCELLATION_TIERS,
+                 max_days=730):
+        self.weekend_multiplier = weekend_multiplier
+        self.peak_fallback_multiplier = peak_fallback_multiplier
+        self.peak_by_month = tuple(month in peak_months for month in range(13))
+        self.weekend_by_weekday = tuple(weekday in weekend_days for weekday in range(7))
+        self.max_days = max_days
+        self.advance_by_days = self._compile_tiers(advance_tiers, max_days)
+        self.cancellation_by_days = self._compile_tiers(cancellation_tiers, max_days)
+        self._night_counts = lru_cache(maxsize=4096)(self._count_nights)
+
+    @staticmethod
+    def _compile_tiers(tiers: Sequence[Tuple[int, float, str]], max_days: int):
+        ordered = sorted(tiers, reverse=True)
+        table = []
+        for days in range(max_days + 1):
+            tier = next((tier for tier in ordered if days >= tier[0]), ordered[-1])
+            table.append((tier[1], tier[2]))
+        return tuple(table)
+
+    def _tier(self, table, days: int) -> Tuple[float, str]:
+        return table[min(max(days, 0), self.max_days)]
+
+    # Seasonality
+
+    def is_peak_season(self, day) -> bool:
+        """Check if a date falls in peak season (April-August and November-December)."""
+        return self.peak_by_month[_as_date(day).month]
+
+    def night_price(self, base_price: float, peak_price: Optional[float], night) -> float:
+        """Price of a single night."""
+        night = _as_date(night)
+        if self.peak_by_month[night.month]:
+            rate = peak_price or (base_price * self.peak_fallback_multiplier)
+        else:
+            rate = base_price
+        if self.weekend_by_weekday[night.weekday()]:
+            rate *= self.weekend_multiplier
+        return rate
+
+    def _weekend_nights(self, start: date, nights: int) -> int:
+        full_weeks, remainder = divmod(nights, 7)
+        first = start.weekday()
+        weekend = self.weekend_by_weekday
+        return (full_weeks * sum(weekend)
+                + sum(1 for offset in range(remainder) if weekend[(first + offset) % 7]))
+
+    def _count_nights(self, check_in: date, check_out: date) -> Tuple[int, int, int, int]:
+        counts = [0, 0, 0, 0]  # off-peak weekday, off-peak weekend, peak weekday, peak weekend
+        segment_start = check_in
+        while segment_start < check_out:
+            # Walk the stay one calendar month at a time
+            if segment_start.month == 12:
+                next_month = date(segment_start.year + 1, 1, 1)
+            else:
+                next_month = date(segment_start.year, segment_start.month + 1, 1)
+            segment_end = min(next_month, check_out)
+
+            nights = (segment_end - segment_start).days
+            weekend = self._weekend_nights(segment_start, nights)
+            offset = 2 if self.peak_by_month[segment_start.month] else 0
+            counts[offset] += nights - weekend
+            counts[offset + 1] += weekend
+            segment_start = segment_end
+        return tuple(counts)
+
+    def night_counts(self, check_in, check_out) -> Tuple[int, int, int, int]:
+        """
+        Count the nights of a stay by pricing category, without walking each day.
+        Returns (off-peak weekday, off-peak weekend, peak weekday, peak weekend).
+        """
+        return self._night_counts(_as_date(check_in), _as_date(check_out))
+
+    def stay_price(self, base_price: float, peak_price: Optional[float], check_in, check_out) -> Optional[float]:
+        """Total price for a stay; None if check-out is not after check-in."""
+        check_in = _as_date(check_in)
+        check_out = _as_date(check_out)
+        if (check_out - check_in).days <= 0:
+            return None
+
+        offpeak_weekday, offpeak_weekend, peak_weekday, peak_weekend = self._night_counts(check_in, check_out)
+        peak_rate = peak_price or (base_price * self.peak_fallback_multiplier)
+        return (offpeak_weekday * base_price
+                + offpeak_weekend * (base_price * self.weekend_multiplier)
+                + peak_weekday * peak_rate
+                + peak_weekend * (peak_rate * self.weekend_multiplier))
+
+    # Discounts and charges
+
+    def advance_booking_discount(self, check_in, today=None) -> Tuple[float, str]:
+        """Discount rate and reason for booking a stay that starts on `check_in`."""
+        days = (_as_date(check_in) - _as_date(today or date.today())).days
+        return self._tier(self.advance_by_days, days)
+
+    def cancellation_charge(self, total_price: float, check_in, today=None) -> Tuple[float, str]:
+        """Charge and reason for cancelling a booking worth `total_price`."""
+        days = (_as_date(check_in) - _as_date(today or date.today())).days
+        rate, reason = self._tier(self.cancellation_by_days, days)
+        return total_price * rate, reason
+
+
+RULES = PricingRules()
+
+is_peak_season = RULES.is_peak_season
+night_price = RULES.night_price
+night_counts = RULES.night_counts
+stay_price = RULES.stay_price
+advance_booking_discount = RULES.advance_booking_discount
+cancellation_charge = RULES.cancellation_charge
+
+
+def price_many(quotes: Iterable[Tuple[object, object, object]]) -> List[Optional[float]]:
+    """
+    Price many (room, check_in, check_out) quotes in one call. Quotes sharing
+    dates (every candidate room of one search, say) share a single night count.
+    Rooms only need `base_price` and `peak_price` attributes.
+    """
+    return [stay_price(room.base_price, room.peak_price, check_in, check_out)
+            for room, check_in, check_out in quotes]
@@ -0,0 +1,202 @@
+import heapq
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from db_pool import as_bool
+
+# Longest statement text kept in reports
+MAX_STATEMENT_LENGTH = 500
+# Distinct suspected statements kept per route
+MAX_SUSPECTS_PER_ROUTE = 20
+
+_SPACE = re.compile(r'\s+')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = r'(?:\?|%s|%\(\w+\)s|:\w+)'
+_PLACEHOLDER_LIST = re.compile(rf'\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)')
+
+
+def statement_shape(statement: str) -> str:
+    """
+    The statement with literals and IN-lists of any length folded, so the
+    same query run for different rows or ids has one shape.
+    """
+    shape = _LITERAL.sub('?', _SPACE.sub(' ', statement).strip())
+    return _PLACEHOLDER_LIST.sub('(?, ...)', shape)[:MAX_STATEMENT_LENGTH]
+
+
+class _RequestQueries:
+    def __init__(self, keep: int):
+        self.keep = keep
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Dict[str, List] = {}
+        self.slowest: List = []
+
+    def record(self, statement: str, seconds: float) -> None:
+        shape = statement_shape(statement)
+        self.count += 1
+        self.seconds += seconds
+        totals = self.shapes.setdefault(shape, [0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, (seconds, shape))
+        elif self.slowest and seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, shape))
+
+    def suspects(self, threshold: int) -> List:
+        """(shape, executions, seconds) of statements repeated at least `threshold` times, most repeated first."""
+        repeated = [(shape, count, seconds) for shape, (count, seconds) in self.shapes.items() if count >= threshold]
+        return sorted(repeated, key=lambda item: -item[1])
+
+
+class _RouteStats:
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.seconds = 0.0
+        self.max_queries = 0
+        self.n_plus_one_requests = 0
+        self.suspects: Dict[str, Dict] = {}
+        self.slowest: Dict[str, float] = {}
+
+
+class QueryStats:
+    """
+    Per-request SQL instrumentation. Cursor execution hooks on every engine
+    (primary and replicas) count each request's statements and database
+    time, keep its slowest statements, and flag statement shapes run at
+    least QUERY_STATS_REPEAT_THRESHOLD times as suspected N+1 queries, e.g.
+    a relationship loaded lazily inside a template loop.
+
+    In debug mode (or with QUERY_STATS_HEADERS on) every response carries
+    X-Query-Count, X-Query-Time-Ms and X-Query-N-Plus-One headers and
+    suspects are logged. Totals per route are kept for /admin/query-stats;
+    like the search cache stats they are per process.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.headers = None
+        self.keep = 5
+        self.threshold = 5
+        self._routes: Dict[str, _RouteStats] = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('QUERY_STATS', 'on')
+        app.config.setdefault('QUERY_STATS_HEADERS', None)
+        app.config.setdefault('QUERY_STATS_SLOWEST', 5)
+        app.config.setdefault('QUERY_STATS_REPEAT_THRESHOLD', 5)
+
+        self.enabled = as_bool(app.config['QUERY_STATS'])
+        # Unset means follow app.debug, which app.run(debug=True) only sets later
+        headers = app.config['QUERY_STATS_HEADERS']
+        self.headers = None if headers is None else as_bool(headers)
+        self.keep = int(app.config['QUERY_STATS_SLOWEST'])
+        self.threshold = int(app.config['QUERY_STATS_REPEAT_THRESHOLD'])
+        if not self.enabled:
+            return
+
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        app.before_request(self._start)
+        app.after_request(self._add_headers)
+        app.teardown_request(self._finish)
+
+    # Per request
+
+    def _start(self):
+        g.query_stats = _RequestQueries(self.keep)
+
+    def _add_headers(self, response):
+        queries = g.get('query_stats')
+        if queries is not None and (current_app.debug if self.headers is None else self.headers):
+            suspects = queries.suspects(self.threshold)
+            response.headers['X-Query-Count'] = str(queries.count)
+            response.headers['X-Query-Time-Ms'] = f'{queries.seconds * 1000:.1f}'
+            response.headers['X-Query-N-Plus-One'] = str(len(suspects))
+            for shape, count, _ in suspects:
+                current_app.logger.warning(f'Suspected N+1 in {request.endpoint}: {count} x {shape}')
+        return response
+
+    def _finish(self, exception=None):
+        # After the response, so statements run while streaming it are counted
+        queries = g.get('query_stats')
+        if queries is None:
+            return
+        route = f'{request.method} {request.url_rule.rule}' if request.url_rule is not None else 'unmatched'
+        suspects = queries.suspects(self.threshold)
+        with self._lock:
+            stats = self._routes.setdefault(route, _RouteStats())
+            stats.requests += 1
+            stats.queries += queries.count
+            stats.seconds += queries.seconds
+            stats.max_queries = max(stats.max_queries, queries.count)
+            if suspects:
+                stats.n_plus_one_requests += 1
+            for shape, count, _ in suspects:
+                suspect = stats.suspects.get(shape)
+                if suspect is None:
+                    if len(stats.suspects) >= MAX_SUSPECTS_PER_ROUTE:
+                        continue
+                    suspect = stats.suspects[shape] = {'requests': 0, 'max_repeats': 0}
+                suspect['requests'] += 1
+                suspect['max_repeats'] = max(suspect['max_repeats'], count)
+            # Each statement once, at its slowest
+            for seconds, shape in queries.slowest:
+                stats.slowest[shape] = max(seconds, stats.slowest.get(shape, 0.0))
+            if len(stats.slowest) > self.keep:
+                stats.slowest = dict(heapq.nlargest(self.keep, stats.slowest.items(), key=lambda item: item[1]))
+
+    # Reporting
+
+    def stats(self) -> List[Dict]:
+        """Totals per route, the routes spending most time in the database first."""
+        with self._lock:
+            routes = [{
+                'route': route,
+                'requests': stats.requests,
+                'queries': stats.queries,
+                'queries_per_request': round(stats.queries / stats.requests, 2),
+                'max_queries': stats.max_queries,
+                'db_ms': round(stats.seconds * 1000, 2),
+                'db_ms_per_request': round(stats.seconds * 1000 / stats.requests, 2),
+                'n_plus_one_requests': stats.n_plus_one_requests,
+                'suspected_n_plus_one': [
+                    {'statement': shape, **suspect}
+                    for shape, suspect in sorted(stats.suspects.items(), key=lambda item: -item[1]['requests'])
+                ],
+                'slowest': [{'statement': shape, 'ms': round(seconds * 1000, 2)}
+                            for shape, seconds in sorted(stats.slowest.items(), key=lambda item: -item[1])]
+            } for route, stats in self._routes.items()]
+        return sorted(routes, key=lambda route: -route['db_ms'])
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+
+def _current() -> Optional[_RequestQueries]:
+    return g.get('query_stats') if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current() is not None:
+        conn.info['query_stats_start'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info.pop('query_stats_start', None)
+    queries = _current()
+    if queries is not None and start is not None:
+        queries.record(statement, time.perf_counter() - start)
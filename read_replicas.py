@@ -0,0 +1,196 @@
+from functools import wraps
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional
+
+from flask import current_app, g, has_request_context, session as user_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+
+from db_pool import engine_options
+
+# Flask session key holding the time until which the user reads from the primary
+STICKY_KEY = 'db_primary_until'
+
+
+def replica_reads(f):
+    """
+    Let a read-only view read from a replica. The choice is made on the
+    view's first query and kept for the rest of the request; a view that
+    writes anyway is sent back to the primary from its first write on.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.replica_reads = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def use_primary() -> None:
+    """
+    Send the rest of this request's reads to the primary. Called before
+    filling a cache shared by every user: an entry stored under a freshly
+    bumped version token must not hold a lagging replica's view, or it is
+    served to everyone, the writer included, until it expires.
+    """
+    if has_request_context():
+        g.replica_primary = True
+
+
+class RoutingSession(Session):
+    """
+    Flask-SQLAlchemy session that asks ReadReplicas for an engine before
+    falling back to the usual bind lookup. Flushes, INSERT/UPDATE/DELETE
+    statements and explicit binds always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            replicas = current_app.extensions.get('read_replicas')
+            if replicas is not None:
+                if self._flushing or getattr(clause, 'is_dml', False):
+                    replicas.wrote(self)
+                else:
+                    engine = replicas.engine_for_request()
+                    if engine is not None:
+                        return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class _Replica:
+    def __init__(self, name, url, engine):
+        self.name = name
+        self.url = url
+        self.engine = engine
+        self.healthy = True
+        self.checked_at = None
+        self.requests = 0
+        self.failures = 0
+
+
+class ReadReplicas:
+    """
+    Routes the reads of @replica_reads views to the replicas in
+    DB_REPLICA_URLS, round-robin, and everything else to the primary.
+
+    A replica is pinged with SELECT 1 when it was last checked more than
+    DB_REPLICA_CHECK_INTERVAL seconds ago, and is skipped while unhealthy;
+    a disconnect while serving also marks it down. With no healthy replica
+    requests read from the primary. After a request commits a write, the
+    user reads from the primary for DB_REPLICA_STICKY_SECONDS (kept in their
+    Flask session, so it holds across workers) and so sees their own booking
+    even if the replicas lag.
+
+    Two SQLite files stand in for a primary and replica locally:
+    DATABASE_URL=sqlite:////tmp/primary.db DB_REPLICA_URLS=sqlite:////tmp/replica.db
+    """
+
+    def __init__(self, app=None, db=None, metrics=None):
+        self.db = None
+        self.replicas: List[_Replica] = []
+        self.check_interval = 10
+        self.sticky_seconds = 30
+        self.primary_reads = 0
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, db, metrics)
+
+    def init_app(self, app, db, metrics=None):
+        app.config.setdefault('DB_REPLICA_URLS', '')
+        app.config.setdefault('DB_REPLICA_CHECK_INTERVAL', 10)
+        app.config.setdefault('DB_REPLICA_STICKY_SECONDS', 30)
+
+        self.db = db
+        self.check_interval = float(app.config['DB_REPLICA_CHECK_INTERVAL'])
+        self.sticky_seconds = float(app.config['DB_REPLICA_STICKY_SECONDS'])
+        urls = [url.strip() for url in app.config['DB_REPLICA_URLS'].split(',') if url.strip()]
+        # Engines connect lazily, so configuring replicas costs nothing at startup
+        self.replicas = []
+        for number, url in enumerate(urls, start=1):
+            name = f'replica-{number}'
+            replica = _Replica(name, url, create_engine(url, **engine_options(app.config, metrics, name, uri=url)))
+            event.listen(replica.engine, 'handle_error', self._error_handler(replica))
+            self.replicas.append(replica)
+        app.extensions['read_replicas'] = self
+
+        event.listen(db.session, 'after_commit', self._committed)
+        event.listen(db.session, 'after_rollback', self._rolled_back)
+
+    # Routing
+
+    def engine_for_request(self):
+        """The replica engine for this request's reads, or None for the primary."""
+        if not g.get('replica_reads') or g.get('replica_primary'):
+            return None
+        if 'replica' not in g:
+            replica = None
+            if self.replicas and user_session.get(STICKY_KEY, 0) <= time.time():
+                replica = self._choose()
+            if replica is None:
+                with self._lock:
+                    self.primary_reads += 1
+            g.replica = replica
+        return g.replica.engine if g.replica is not None else None
+
+    def _choose(self) -> Optional[_Replica]:
+        start = next(self._turn)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if self._is_healthy(replica):
+                with self._lock:
+                    replica.requests += 1
+                return replica
+        return None
+
+    def _is_healthy(self, replica: _Replica) -> bool:
+        now = time.monotonic()
+        if replica.checked_at is None or now - replica.checked_at > self.check_interval:
+            replica.checked_at = now
+            try:
+                with replica.engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+                replica.healthy = True
+            except SQLAlchemyError:
+                current_app.logger.warning(f'Read replica {replica.name} failed its health check')
+                replica.healthy = False
+                replica.failures += 1
+        return replica.healthy
+
+    def _error_handler(self, replica: _Replica):
+        def handle_error(context):
+            if context.is_disconnect:
+                replica.healthy = False
+                replica.failures += 1
+        return handle_error
+
+    # Read-your-writes
+
+    def wrote(self, session) -> None:
+        """Send the rest of this request, and the user's next requests, to the primary."""
+        session.info['replica_wrote'] = True
+        if has_request_context():
+            g.replica_primary = True
+
+    def _committed(self, session):
+        if session.info.pop('replica_wrote', False) and has_request_context() and self.replicas:
+            user_session[STICKY_KEY] = time.time() + self.sticky_seconds
+
+    def _rolled_back(self, session):
+        session.info.pop('replica_wrote', None)
+
+    def stats(self) -> Dict:
+        return {
+            'replicas': [{
+                'name': replica.name,
+                'url': make_url(replica.url).render_as_string(hide_password=True),
+                'healthy': replica.healthy,
+                'requests': replica.requests,
+                'failures': replica.failures
+            } for replica in self.replicas],
+            'primary_reads': self.primary_reads,
+            'sticky_seconds': self.sticky_seconds
+        }
@@ -0,0 +1,96 @@
+import os
+import time
+
+from flask import g, request, before_render_template, template_rendered
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def multiprocess_mode() -> bool:
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+class RequestMetrics:
+    """
+    Prometheus metrics per route: a latency histogram, requests in flight,
+    responses by status code, and how much of each request went to the
+    database (from QueryStats) and to rendering templates.
+
+    Under gunicorn each worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+    (set by gunicorn.conf.py) and /metrics adds up every worker's files, so
+    a scrape sees the whole server whichever worker answers it. Run as a
+    single process the metrics are served from memory.
+    """
+
+    def __init__(self, app=None):
+        self.registry = CollectorRegistry()
+        labels = ['method', 'route']
+        self.latency = Histogram('http_request_duration_seconds', 'Time to serve a request, including streaming',
+                                 labels, buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.db_time = Histogram('http_request_db_seconds', 'Time a request spent executing SQL',
+                                 labels, buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.template_time = Histogram('http_request_template_seconds', 'Time a request spent rendering templates',
+                                       labels, buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.in_progress = Gauge('http_requests_in_progress', 'Requests being served', labels,
+                                 multiprocess_mode='livesum', registry=self.registry)
+        self.responses = Counter('http_responses_total', 'Responses sent, by status code',
+                                 labels + ['status'], registry=self.registry)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._record_status)
+        app.teardown_request(self._finish)
+        before_render_template.connect(self._template_started, app)
+        template_rendered.connect(self._template_finished, app)
+
+    # Per request
+
+    @staticmethod
+    def _labels():
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        return request.method, route
+
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_template_seconds = 0.0
+        self.in_progress.labels(*self._labels()).inc()
+
+    def _record_status(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _template_started(self, sender, template, context, **extra):
+        g.metrics_template_started = time.perf_counter()
+
+    def _template_finished(self, sender, template, context, **extra):
+        started = g.pop('metrics_template_started', None)
+        if started is not None:
+            g.metrics_template_seconds = g.get('metrics_template_seconds', 0.0) + time.perf_counter() - started
+
+    def _finish(self, exception=None):
+        # After the response, so streamed exports are timed to their last row
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        labels = self._labels()
+        self.latency.labels(*labels).observe(time.perf_counter() - started)
+        self.in_progress.labels(*labels).dec()
+        self.responses.labels(*labels, str(g.get('metrics_status', 500))).inc()
+        self.template_time.labels(*labels).observe(g.get('metrics_template_seconds', 0.0))
+        queries = g.get('query_stats')
+        if queries is not None:
+            self.db_time.labels(*labels).observe(queries.seconds)
+
+    # Exposition
+
+    def exposition(self) -> bytes:
+        """Every metric in the Prometheus text format, summed over all workers in multi-process mode."""
+        if multiprocess_mode():
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            return generate_latest(registry)
+        return generate_latest(self.registry)
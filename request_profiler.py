@@ -0,0 +1,197 @@
+import cProfile
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+import uuid
+
+from flask import current_app, g, request
+from flask_login import current_user
+
+# Request header or query argument with which an admin asks for a profile
+TRIGGER_HEADER = 'X-Profile'
+TRIGGER_ARG = '_profile'
+# Each profile is a .json summary, a cProfile .prof file and a .collapsed stack file
+PROFILE_FILES = ('json', 'prof', 'collapsed')
+
+
+@lru_cache(maxsize=4096)
+def _code_label(code) -> str:
+    filename = code.co_filename
+    for path in sorted(sys.path, key=len, reverse=True):
+        if path and filename.startswith(path + os.sep):
+            filename = filename[len(path) + 1:]
+            break
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ':')
+
+
+class _StackSampler(threading.Thread):
+    """Counts the stacks of one thread every `interval` seconds, root frame first."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_code_label(frame.f_code))
+                frame = frame.f_back
+            # A stack taken while stopping shows the profiler, not the request
+            if stack and not self._stopped.is_set():
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self) -> Counter:
+        self._stopped.set()
+        self.join()
+        return self.stacks
+
+
+class RequestProfiler:
+    """
+    Profiles single production requests: those an admin flags with an
+    X-Profile header or `_profile=1` argument, and a random
+    PROFILER_SAMPLE_RATE share of all requests. The request runs under
+    cProfile while a sampler thread records its stack every
+    PROFILER_INTERVAL seconds. Both are written to PROFILER_DIR: a .prof
+    file for pstats or snakeviz, and a .collapsed file of "frame;frame count"
+    lines for flamegraph.pl or speedscope. Only the newest PROFILER_KEEP
+    profiles are kept.
+
+    A process profiles one request at a time. A request that would overlap
+    another runs unprofiled, so sampling cannot pile up under load.
+    """
+
+    def __init__(self, app=None):
+        self.directory = None
+        self.sample_rate = 0.0
+        self.interval = 0.005
+        self.keep = 100
+        self._busy = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PROFILER_DIR', os.path.join(app.instance_path, 'profiles'))
+        app.config.setdefault('PROFILER_SAMPLE_RATE', 0.0)
+        app.config.setdefault('PROFILER_INTERVAL', 0.005)
+        app.config.setdefault('PROFILER_KEEP', 100)
+
+        self.directory = app.config['PROFILER_DIR']
+        self.sample_rate = float(app.config['PROFILER_SAMPLE_RATE'])
+        self.interval = float(app.config['PROFILER_INTERVAL'])
+        self.keep = int(app.config['PROFILER_KEEP'])
+        app.before_request(self._start)
+        app.teardown_request(self._finish)
+
+    # Per request
+
+    def _trigger(self) -> Optional[str]:
+        if request.headers.get(TRIGGER_HEADER) or request.args.get(TRIGGER_ARG):
+            # Loads the user only for flagged requests
+            if current_user.is_authenticated and current_user.is_admin:
+                return 'admin'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    def _start(self):
+        trigger = self._trigger()
+        if trigger is None or not self._busy.acquire(blocking=False):
+            return
+        sampler = _StackSampler(threading.get_ident(), self.interval)
+        profile = cProfile.Profile()
+        g.request_profile = (trigger, time.perf_counter(), profile, sampler)
+        sampler.start()
+        profile.enable()
+
+    def _finish(self, exception=None):
+        # After the response, so a streamed export is profiled to its last row
+        state = g.pop('request_profile', None)
+        if state is None:
+            return
+        trigger, started, profile, sampler = state
+        try:
+            stacks = sampler.stop()
+            profile.disable()
+            duration = time.perf_counter() - started
+            self._write(trigger, duration, profile, stacks, exception)
+        except OSError as e:
+            current_app.logger.warning(f'Could not write request profile: {e}')
+        finally:
+            self._busy.release()
+
+    def _write(self, trigger, duration, profile, stacks, exception) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        now = datetime.now()
+        # Sorts chronologically, which listing and pruning rely on; the suffix
+        # keeps workers finishing in the same microsecond apart
+        name = f"{now.strftime('%Y%m%d-%H%M%S-%f')}-{uuid.uuid4().hex[:4]}"
+        path = os.path.join(self.directory, name)
+        profile.dump_stats(path + '.prof')
+        with open(path + '.collapsed', 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        summary = {
+            'name': name,
+            'recorded': now.strftime('%Y-%m-%d %H:%M:%S'),
+            'method': request.method,
+            'path': request.path,
+            'route': request.url_rule.rule if request.url_rule is not None else None,
+            'endpoint': request.endpoint,
+            'duration_ms': round(duration * 1000, 2),
+            'samples': sum(stacks.values()),
+            'trigger': trigger,
+            'error': repr(exception) if exception is not None else None,
+            'pid': os.getpid()
+        }
+        # Written last: a profile is listed only once its files are complete
+        with open(path + '.json', 'w') as f:
+            json.dump(summary, f)
+        self._prune()
+
+    # Spool
+
+    def profiles(self, limit: Optional[int] = None) -> List[Dict]:
+        """Summaries of the stored profiles, newest first."""
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        summaries = []
+        for filename in sorted(os.listdir(self.directory), reverse=True):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    summaries.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # pruned by another worker meanwhile
+            if limit is not None and len(summaries) >= limit:
+                break
+        return summaries
+
+    def path(self, name: str, kind: str) -> Optional[str]:
+        """The file of profile `name` of the given kind, or None if there is no such profile."""
+        if kind not in PROFILE_FILES or os.path.basename(name) != name or name.startswith('.'):
+            return None
+        path = os.path.join(self.directory, f'{name}.{kind}')
+        return path if os.path.isfile(path) else None
+
+    def _prune(self) -> None:
+        names = sorted(filename[:-5] for filename in os.listdir(self.directory) if filename.endswith('.json'))
+        for name in names[:-max(self.keep, 1)]:
+            for kind in PROFILE_FILES:
+                try:
+                    os.remove(os.path.join(self.directory, f'{name}.{kind}'))
+                except FileNotFoundError:
+                    pass
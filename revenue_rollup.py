@@ -0,0 +1,198 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Tuple
+
+from sqlalchemy import event, literal
+
+TRACKED_ATTRIBUTES = ('user_id', 'hotel_id', 'room_id', 'status', 'total_price', 'created_at')
+
+
+def _day(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _contributions(room_types, user_id, hotel_id, room_id, status, total_price, created_at):
+    """The rollup rows one booking counts towards, keyed by (model name, primary key)."""
+    return [
+        ('RevenueDaily', (hotel_id, _day(created_at), status, room_types.get(room_id, ''))),
+        ('CustomerRevenue', (user_id, status)),
+    ], total_price or 0.0
+
+
+def upsert(connection, table, key_columns, rows, update):
+    """
+    Insert `rows`, or for rows whose key already exists apply `update`, a
+    function of (table columns, incoming row columns) returning the values to set.
+    """
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(table)
+        statement = statement.on_duplicate_key_update(update(table.c, statement.inserted))
+        connection.execute(statement, rows)
+    elif dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(index_elements=key_columns,
+                                                    set_=update(table.c, statement.excluded))
+        connection.execute(statement, rows)
+    else:
+        for row in rows:
+            incoming = {column: literal(value, table.c[column].type) for column, value in row.items()}
+            updated = connection.execute(table.update().where(
+                *[table.c[column] == row[column] for column in key_columns]
+            ).values(update(table.c, incoming)))
+            if updated.rowcount == 0:
+                connection.execute(table.insert(), [row])
+
+
+def _increment(columns, incoming):
+    return {'bookings': columns.bookings + incoming['bookings'],
+            'revenue': columns.revenue + incoming['revenue']}
+
+
+class RevenueRollup:
+    """
+    Keeps the revenue rollups in step with the bookings table. `revenue_daily`
+    holds booking counts and revenue per (hotel, day booked, status, room
+    type) and `customer_revenue` per (user, status), so reports sum a few
+    rollup rows instead of every booking.
+
+    Every flush that inserts, updates or deletes a Booking applies the
+    difference between its old and new contribution in the same transaction,
+    whichever code path changed it, and refreshes the monthly sales reports
+    whose confirmed totals moved. Room types are read as they are at flush
+    time, so run `rebuild()`, which recomputes both tables from scratch,
+    after retyping rooms that already have bookings.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.app = None
+        self.db = None
+        self._listeners = []
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.app = app
+        self.db = db
+        event.listen(db.session, 'before_flush', self._capture_old)
+        event.listen(db.session, 'after_flush', self._apply_deltas)
+        event.listen(db.session, 'after_commit', self._notify)
+        event.listen(db.session, 'after_rollback', self._discard)
+
+    def on_change(self, callback) -> None:
+        """Call `callback()` after each commit that changed the rollups, e.g. to retire cached reports."""
+        self._listeners.append(callback)
+
+    def _notify(self, session):
+        if session.info.pop('revenue_rollup_changed', False):
+            for callback in self._listeners:
+                callback()
+
+    def _discard(self, session):
+        session.info.pop('revenue_rollup_changed', None)
+
+    # Incremental maintenance
+
+    def _capture_old(self, session, flush_context, instances):
+        from app import Booking
+
+        changed = [obj for obj in list(session.dirty) + list(session.deleted)
+                   if isinstance(obj, Booking) and obj.id is not None]
+        if not changed:
+            return
+        # Read the stored row rather than attribute history, which lacks the
+        # old value when an expired attribute is overwritten without a load
+        columns = [getattr(Booking, name) for name in TRACKED_ATTRIBUTES]
+        rows = session.connection().execute(
+            self.db.select(Booking.id, *columns).where(Booking.id.in_([obj.id for obj in changed])))
+        old = session.info.setdefault('revenue_rollup_old', {})
+        for booking_id, *values in rows:
+            old.setdefault(booking_id, tuple(values))
+
+    def _apply_deltas(self, session, flush_context):
+        from app import Booking, Room
+
+        old = session.info.pop('revenue_rollup_old', {})
+        changes = []
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if not isinstance(obj, Booking):
+                continue
+            if obj.id in old:
+                changes.append((old[obj.id], -1))
+            if obj not in session.deleted:
+                changes.append((tuple(getattr(obj, name) for name in TRACKED_ATTRIBUTES), 1))
+        if not changes:
+            return
+
+        room_index = TRACKED_ATTRIBUTES.index('room_id')
+        room_ids = {values[room_index] for values, _ in changes}
+        connection = session.connection()
+        room_types = dict(connection.execute(self.db.select(Room.id, Room.type).where(Room.id.in_(room_ids))).all())
+
+        deltas: Dict[Tuple[str, tuple], list] = defaultdict(lambda: [0, 0.0])
+        for values, sign in changes:
+            keys, revenue = _contributions(room_types, *values)
+            for key in keys:
+                deltas[key][0] += sign
+                deltas[key][1] += sign * revenue
+
+        rows_by_model = defaultdict(list)
+        for (model_name, key), (bookings, revenue) in deltas.items():
+            if bookings or revenue:
+                rows_by_model[model_name].append((key, bookings, revenue))
+        if not rows_by_model:
+            return
+        session.info['revenue_rollup_changed'] = True
+
+        from app import RevenueDaily, CustomerRevenue
+        models = {'RevenueDaily': RevenueDaily, 'CustomerRevenue': CustomerRevenue}
+        for model_name, changes in rows_by_model.items():
+            table = models[model_name].__table__
+            key_columns = [column.name for column in table.primary_key.columns]
+            rows = [dict(zip(key_columns, key), bookings=bookings, revenue=revenue)
+                    for key, bookings, revenue in changes]
+            upsert(connection, table, key_columns, rows, _increment)
+
+        # Keep the monthly sales reports in step with confirmed revenue
+        confirmed_months = set()
+        for (hotel_id, day, status, _), _, _ in rows_by_model.get('RevenueDaily', []):
+            if status == 'confirmed':
+                confirmed_months.add((hotel_id, day.replace(day=1)))
+        if confirmed_months:
+            from sales_reports import refresh_sales_reports
+            refresh_sales_reports(confirmed_months, connection)
+
+    # Rebuilding
+
+    def rebuild(self) -> Dict:
+        """Recompute both rollups from the bookings table in one transaction."""
+        from app import Booking, Room, RevenueDaily, CustomerRevenue
+
+        db = self.db
+        day = db.func.date(Booking.created_at)
+        room_type = db.func.coalesce(Room.type, '')
+        db.session.execute(db.delete(RevenueDaily))
+        db.session.execute(db.delete(CustomerRevenue))
+        db.session.execute(db.insert(RevenueDaily).from_select(
+            ['hotel_id', 'day', 'status', 'room_type', 'bookings', 'revenue'],
+            db.select(Booking.hotel_id, day, Booking.status, room_type, db.func.count(Booking.id),
+                      db.func.coalesce(db.func.sum(Booking.total_price), 0.0)
+                      ).outerjoin(Room, Booking.room_id == Room.id
+                                  ).group_by(Booking.hotel_id, day, Booking.status, room_type)))
+        db.session.execute(db.insert(CustomerRevenue).from_select(
+            ['user_id', 'status', 'bookings', 'revenue'],
+            db.select(Booking.user_id, Booking.status, db.func.count(Booking.id),
+                      db.func.coalesce(db.func.sum(Booking.total_price), 0.0)
+                      ).group_by(Booking.user_id, Booking.status)))
+        db.session.info['revenue_rollup_changed'] = True
+        db.session.commit()
+
+        return {
+            'daily_rows': db.session.scalar(db.select(db.func.count()).select_from(RevenueDaily)),
+            'customer_rows': db.session.scalar(db.select(db.func.count()).select_from(CustomerRevenue))
+        }
@@ -0,0 +1,197 @@
+from datetime import date, timedelta
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+import uuid
+
+from flask_caching import Cache
+
+from read_replicas import use_primary
+
+BUCKETS = ('day', 'week', 'month')
+GROUPS = ('hotel', 'room_type')
+VERSION_KEY = 'version'
+# Most buckets one series may span: over a year of days, or decades of months
+MAX_BUCKETS = 400
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    """First day of the bucket holding `day`; weeks start on Monday."""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start: date, bucket: str) -> date:
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if bucket == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def bucket_count(start: date, end: date, bucket: str) -> int:
+    """How many buckets bucket_starts(start, end, bucket) returns, without building them."""
+    if bucket == 'week':
+        return (bucket_start(end, bucket) - bucket_start(start, bucket)).days // 7 + 1
+    if bucket == 'month':
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return (end - start).days + 1
+
+
+def bucket_starts(start: date, end: date, bucket: str) -> List[date]:
+    """Every bucket from the one holding `start` to the one holding `end`, so charts get no gaps."""
+    starts = []
+    current = bucket_start(start, bucket)
+    while current <= end:
+        starts.append(current)
+        current = _next_bucket(current, bucket)
+    return starts
+
+
+def revenue_series(start: date, end: date, bucket: str = 'day', group_by: Optional[str] = None,
+                   hotel_ids: Optional[Iterable[int]] = None, status: str = 'confirmed') -> Dict:
+    """
+    Booking counts and revenue for bookings made from `start` to `end`
+    (inclusive), in day, week or month buckets, as totals and optionally one
+    series per hotel or room type. One grouped query over the daily revenue
+    rollup, so the cost follows the number of days and groups, not bookings.
+
+    The result is shaped for the report charts: `dates` labels the buckets,
+    `revenue` and `bookings` are the totals aligned with them, `series` holds
+    {'key', 'label', 'revenue', 'bookings'} per group and `table` the rows
+    for the report table.
+    """
+    from app import db, Hotel, RevenueDaily
+
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    if group_by is not None and group_by not in GROUPS:
+        raise ValueError(f"group must be one of {', '.join(GROUPS)}")
+
+    starts = bucket_starts(start, end, bucket)
+    position = {bucket_value: index for index, bucket_value in enumerate(starts)}
+    dimension = {'hotel': RevenueDaily.hotel_id, 'room_type': RevenueDaily.room_type}.get(group_by)
+
+    columns = [RevenueDaily.day]
+    if dimension is not None:
+        columns.append(dimension)
+    statement = db.select(
+        *columns, db.func.sum(RevenueDaily.bookings), db.func.sum(RevenueDaily.revenue)
+    ).where(
+        RevenueDaily.status == status,
+        RevenueDaily.day >= start,
+        RevenueDaily.day <= end
+    ).group_by(*columns)
+    if hotel_ids is not None:
+        statement = statement.where(RevenueDaily.hotel_id.in_(list(hotel_ids)))
+
+    totals_bookings = [0] * len(starts)
+    totals_revenue = [0.0] * len(starts)
+    groups = {}
+    for row in db.session.execute(statement):
+        day, bookings, revenue = row[0], int(row[-2] or 0), float(row[-1] or 0.0)
+        index = position[bucket_start(day, bucket)]
+        totals_bookings[index] += bookings
+        totals_revenue[index] += revenue
+        if dimension is not None:
+            group = groups.setdefault(row[1], ([0] * len(starts), [0.0] * len(starts)))
+            group[0][index] += bookings
+            group[1][index] += revenue
+
+    labels = {key: key for key in groups}
+    if group_by == 'hotel' and groups:
+        labels = dict(db.session.execute(db.select(Hotel.id, Hotel.name).where(Hotel.id.in_(list(groups)))).all())
+    series = [
+        {'key': key, 'label': labels.get(key) or key,
+         'bookings': bookings, 'revenue': [round(value, 2) for value in revenue]}
+        for key, (bookings, revenue) in sorted(groups.items(), key=lambda item: str(item[0]))
+    ]
+
+    # Rows are keyed by their header, so cells stay aligned with the headers
+    # however the JSON encoder orders keys
+    if series:
+        heading = 'Hotel' if group_by == 'hotel' else 'Room Type'
+        rows = [{heading: item['label'], 'Bookings': sum(item['bookings']),
+                 'Revenue (GBP)': round(sum(item['revenue']), 2)} for item in series]
+    else:
+        heading = 'Period'
+        rows = [{heading: bucket_value.isoformat(), 'Bookings': bookings, 'Revenue (GBP)': round(revenue, 2)}
+                for bucket_value, bookings, revenue in zip(starts, totals_bookings, totals_revenue)]
+    table = {'headers': {name: name for name in (heading, 'Bookings', 'Revenue (GBP)')}, 'rows': rows}
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'bucket': bucket,
+        'group': group_by,
+        'dates': [bucket_value.isoformat() for bucket_value in starts],
+        'bookings': totals_bookings,
+        'revenue': [round(value, 2) for value in totals_revenue],
+        'series': series,
+        'table': table
+    }
+
+
+class RevenueSeries:
+    """
+    Report chart series behind ETags. The tag is a hash of the request
+    parameters and a version token that RevenueRollup replaces after every
+    commit that moves the rollup, so while bookings are unchanged a redraw
+    costs one cache lookup and an empty 304, and any booking change retires
+    every outstanding tag at once. Computed series are cached under their
+    tag in a store shared by all workers (FileSystemCache by default, Redis
+    via REPORT_CACHE_REDIS_URL).
+    """
+
+    def __init__(self, app=None, rollup=None):
+        self.cache = Cache()
+        self.timeout = 300
+        if app is not None:
+            self.init_app(app, rollup)
+
+    def init_app(self, app, rollup=None):
+        app.config.setdefault('REPORT_CACHE_REDIS_URL', None)
+        app.config.setdefault('REPORT_CACHE_TYPE',
+                              'RedisCache' if app.config['REPORT_CACHE_REDIS_URL'] else 'FileSystemCache')
+        app.config.setdefault('REPORT_CACHE_DIR', os.path.join(app.instance_path, 'report_cache'))
+        app.config.setdefault('REPORT_CACHE_TIMEOUT', 300)
+
+        self.timeout = int(app.config['REPORT_CACHE_TIMEOUT'])
+        self.cache.init_app(app, config={
+            'CACHE_TYPE': app.config['REPORT_CACHE_TYPE'],
+            'CACHE_DEFAULT_TIMEOUT': self.timeout,
+            'CACHE_DIR': app.config['REPORT_CACHE_DIR'],
+            'CACHE_REDIS_URL': app.config['REPORT_CACHE_REDIS_URL'],
+            'CACHE_KEY_PREFIX': 'report_'
+        })
+        if rollup is not None:
+            rollup.on_change(self.invalidate)
+
+    def version(self) -> str:
+        token = self.cache.get(VERSION_KEY)
+        if token is None:
+            # add() keeps whichever token another worker stored first
+            self.cache.add(VERSION_KEY, uuid.uuid4().hex, timeout=0)
+            token = self.cache.get(VERSION_KEY) or ''
+        return token
+
+    def invalidate(self) -> None:
+        self.cache.set(VERSION_KEY, uuid.uuid4().hex, timeout=0)
+
+    def etag(self, params: Dict) -> str:
+        key = json.dumps([self.version(), params], sort_keys=True, default=str)
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get(self, params: Dict, etag: Optional[str] = None) -> Dict:
+        """The series for `params` (revenue_series keyword arguments), from the cache when already built."""
+        etag = etag or self.etag(params)
+        series = self.cache.get(etag)
+        if series is None:
+            use_primary()
+            series = revenue_series(**params)
+            self.cache.set(etag, series, timeout=self.timeout)
+        return series
@@ -0,0 +1,93 @@
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import extract
+
+from revenue_rollup import upsert
+
+PROFIT_MARGIN = 0.2
+
+
+def month_start(value) -> date:
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.replace(day=1)
+
+
+def next_month(month: date) -> date:
+    return (month_start(month) + timedelta(days=32)).replace(day=1)
+
+
+def months_between(start, end) -> List[date]:
+    """First days of every month from `start` to `end`, both inclusive."""
+    months = []
+    month = month_start(start)
+    while month <= month_start(end):
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def _replace_totals(columns, incoming):
+    return {'total_sales': incoming['total_sales'],
+            'total_bookings': incoming['total_bookings'],
+            'profit': incoming['profit']}
+
+
+def build_sales_reports(start, end, hotel_ids: Optional[Iterable[int]] = None, connection=None) -> int:
+    """
+    Materialize `sales_reports` rows for every month from `start` to `end`
+    (inclusive) and every hotel, or just `hotel_ids`. Totals come from the
+    confirmed rows of the daily revenue rollup in one grouped query, and
+    months without sales get a zero row. Rows are upserted, so rebuilding
+    any range is idempotent. Returns the number of rows written; committing
+    is left to the caller unless called without a connection.
+    """
+    from app import db, Hotel, RevenueDaily, SalesReport
+
+    commit = connection is None
+    if connection is None:
+        connection = db.session.connection()
+
+    months = months_between(start, end)
+    if not months:
+        return 0
+    if hotel_ids is None:
+        hotel_ids = connection.execute(db.select(Hotel.id)).scalars().all()
+    hotel_ids = sorted(set(hotel_ids))
+    if not hotel_ids:
+        return 0
+
+    year = extract('year', RevenueDaily.day)
+    month = extract('month', RevenueDaily.day)
+    totals = {}
+    for hotel_id, year_value, month_value, bookings, revenue in connection.execute(
+            db.select(RevenueDaily.hotel_id, year, month,
+                      db.func.sum(RevenueDaily.bookings), db.func.sum(RevenueDaily.revenue)).where(
+                RevenueDaily.hotel_id.in_(hotel_ids),
+                RevenueDaily.day >= months[0],
+                RevenueDaily.day < next_month(months[-1]),
+                RevenueDaily.status == 'confirmed'
+            ).group_by(RevenueDaily.hotel_id, year, month)):
+        totals[(hotel_id, date(int(year_value), int(month_value), 1))] = (bookings or 0, revenue or 0.0)
+
+    rows = []
+    for hotel_id in hotel_ids:
+        for month_value in months:
+            bookings, revenue = totals.get((hotel_id, month_value), (0, 0.0))
+            rows.append({'hotel_id': hotel_id, 'month': month_value, 'total_sales': revenue,
+                         'total_bookings': bookings, 'profit': revenue * PROFIT_MARGIN})
+
+    upsert(connection, SalesReport.__table__, ['hotel_id', 'month'], rows, _replace_totals)
+    if commit:
+        db.session.commit()
+    return len(rows)
+
+
+def refresh_sales_reports(hotel_months: Iterable, connection) -> None:
+    """Rebuild the (hotel_id, month) reports touched by a change in confirmed bookings."""
+    by_month = {}
+    for hotel_id, month in hotel_months:
+        by_month.setdefault(month_start(month), set()).add(hotel_id)
+    for month, hotel_ids in by_month.items():
+        build_sales_reports(month, month, hotel_ids, connection=connection)
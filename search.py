@@ -0,0 +1,67 @@
+from datetime import date
+from collections import namedtuple
+from typing import List, Optional
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import aliased
+
+from inventory import busy_room_ids
+from pricing import RULES
+
+HotelResult = namedtuple('HotelResult', ['id', 'name', 'city', 'rating', 'free_rooms', 'min_price'])
+
+
+def _stay_price(Room, check_in: date, check_out: date):
+    """SQL expression for RULES.stay_price of each room, from the stay's night counts."""
+    offpeak_weekday, offpeak_weekend, peak_weekday, peak_weekend = RULES.night_counts(check_in, check_out)
+    # A zero peak_price counts as unset, as in PricingRules
+    peak_rate = func.coalesce(func.nullif(Room.peak_price, 0), Room.base_price * RULES.peak_fallback_multiplier)
+    return ((offpeak_weekday + offpeak_weekend * RULES.weekend_multiplier) * Room.base_price
+            + (peak_weekday + peak_weekend * RULES.weekend_multiplier) * peak_rate)
+
+
+def search_hotels(city: Optional[str], check_in: date, check_out: date,
+                  room_type: str = 'any', rooms_needed: int = 1) -> List[HotelResult]:
+    """
+    Find hotels with at least `rooms_needed` rooms free for the whole stay.
+    Free rooms are counted and the nightly "from" price (GBP) is taken in a
+    single grouped query instead of one room query per hotel.
+
+    The "from" price is the cheapest average nightly rate over the stay, read
+    from the price calendar's prefix sums. Rooms outside the calendar window
+    fall back to the same average computed by the pricing rules in SQL.
+    """
+    from app import db, Hotel, Room, RoomPriceNight
+
+    stay_start = aliased(RoomPriceNight)
+    stay_end = aliased(RoomPriceNight)
+    nights = (check_out - check_in).days
+    if nights <= 0:
+        raise ValueError('check_out must be after check_in')
+    nightly_price = func.coalesce((stay_end.cumulative - stay_start.cumulative) / nights,
+                                  _stay_price(Room, check_in, check_out) / nights)
+
+    free_rooms = func.count(Room.id)
+    query = db.select(
+        Hotel.id, Hotel.name, Hotel.city, Hotel.rating,
+        free_rooms.label('free_rooms'),
+        func.min(nightly_price).label('min_price')
+    ).join(Room, Room.hotel_id == Hotel.id).outerjoin(
+        stay_start, and_(stay_start.room_id == Room.id, stay_start.night == check_in)
+    ).outerjoin(
+        stay_end, and_(stay_end.room_id == Room.id, stay_end.night == check_out)
+    ).where(
+        Room.available.is_(True),
+        Room.id.not_in(busy_room_ids(check_in, check_out))
+    )
+
+    if city:
+        query = query.where(Hotel.city == city)
+    if room_type and room_type != 'any':
+        query = query.where(Room.type == room_type)
+
+    query = query.group_by(
+        Hotel.id, Hotel.name, Hotel.city, Hotel.rating
+    ).having(free_rooms >= rooms_needed).order_by(Hotel.name)
+
+    return [HotelResult(*row) for row in db.session.execute(query)]
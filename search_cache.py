@@ -0,0 +1,213 @@
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+import hashlib
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+
+from flask_caching import Cache
+from flask_caching.backends.base import BaseCache
+from flask_caching.backends.rediscache import RedisCache
+
+from read_replicas import use_primary
+
+
+class LRUCache(BaseCache):
+    """
+    Thread-safe in-process cache with per-key TTL and least-recently-used
+    eviction once `threshold` entries are stored. Usable as a Flask-Caching
+    backend via CACHE_TYPE='search_cache.LRUCache'.
+    """
+
+    def __init__(self, threshold=1000, default_timeout=300):
+        super().__init__(default_timeout=default_timeout)
+        self._threshold = threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(threshold=config['CACHE_THRESHOLD'])
+        return cls(*args, **kwargs)
+
+    def _expiry(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time.monotonic() + timeout if timeout > 0 else None
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        with self._lock:
+            self._entries[key] = (value, self._expiry(timeout))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._threshold:
+                self._entries.popitem(last=False)
+        return True
+
+    def add(self, key, value, timeout=None):
+        with self._lock:
+            if key in self._entries:
+                return False
+        return self.set(key, value, timeout)
+
+    def delete(self, key):
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def has(self, key):
+        return self.get(key) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        return True
+
+
+def _normalize_city(city: Optional[str]) -> str:
+    return city.strip().lower().replace(' ', '_') if city else '*'
+
+
+def _nights(check_in: date, check_out: date) -> List[date]:
+    if isinstance(check_in, datetime):
+        check_in = check_in.date()
+    if isinstance(check_out, datetime):
+        check_out = check_out.date()
+    return [check_in + timedelta(days=offset) for offset in range((check_out - check_in).days)]
+
+
+class SearchCache:
+    """
+    Cache of hotel search results (GBP rows from `search_hotels`), keyed on the
+    normalized search tuple. Currency conversion happens after the cache, so a
+    single entry serves every display currency.
+
+    Each entry's key embeds version tokens for its city and for every night of
+    the stay. A booking change bumps the tokens for its hotel's city and nights
+    only; admin edits to a hotel or room bump a city-wide token. Stale entries
+    are then never read again and age out through TTL/LRU eviction.
+
+    Entries and tokens live in FileSystemCache by default (Redis via
+    SEARCH_CACHE_REDIS_URL), shared by every worker, so a booking taken by
+    one worker retires the results cached by all of them. The in-process
+    search_cache.LRUCache is only safe with a single worker.
+
+    Hit, miss and invalidation counters are kept in the same backend, so
+    stats() reports totals across every worker rather than for one process.
+    """
+
+    def __init__(self, app=None):
+        self.cache = Cache()
+        self.timeout = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SEARCH_CACHE_REDIS_URL', None)
+        app.config.setdefault('SEARCH_CACHE_TYPE',
+                              'RedisCache' if app.config['SEARCH_CACHE_REDIS_URL'] else 'FileSystemCache')
+        app.config.setdefault('SEARCH_CACHE_DIR', os.path.join(app.instance_path, 'search_cache'))
+        app.config.setdefault('SEARCH_CACHE_TIMEOUT', 300)
+        app.config.setdefault('SEARCH_CACHE_THRESHOLD', 1000)
+
+        self.timeout = int(app.config['SEARCH_CACHE_TIMEOUT'])
+        self.cache.init_app(app, config={
+            'CACHE_TYPE': app.config['SEARCH_CACHE_TYPE'],
+            'CACHE_DEFAULT_TIMEOUT': self.timeout,
+            'CACHE_THRESHOLD': int(app.config['SEARCH_CACHE_THRESHOLD']),
+            'CACHE_DIR': app.config['SEARCH_CACHE_DIR'],
+            'CACHE_REDIS_URL': app.config['SEARCH_CACHE_REDIS_URL'],
+            'CACHE_KEY_PREFIX': 'search_'
+        })
+
+    def _version_keys(self, city_key: str, nights: List[date]) -> List[str]:
+        keys = [f"v:city:{city_key}"]
+        keys.extend(f"v:night:{city_key}:{night.isoformat()}" for night in nights)
+        return keys
+
+    def _versions(self, keys: List[str]) -> List[str]:
+        tokens = self.cache.get_many(*keys)
+        missing = {key: uuid.uuid4().hex for key, token in zip(keys, tokens) if token is None}
+        if missing:
+            # A fresh token never matches an entry written under an evicted one
+            self.cache.set_many(missing, timeout=0)
+        return [token if token is not None else missing[key] for key, token in zip(keys, tokens)]
+
+    def _entry_key(self, city, check_in, check_out, room_type, rooms_needed) -> str:
+        city_key = _normalize_city(city)
+        versions = self._versions(self._version_keys(city_key, _nights(check_in, check_out)))
+        raw = '|'.join([city_key, str(check_in), str(check_out), room_type or 'any',
+                        str(rooms_needed)] + versions)
+        return 'r:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get_or_search(self, city, check_in, check_out, room_type, rooms_needed, search: Callable) -> List:
+        """Return cached results for the search, running `search()` on a miss."""
+        key = self._entry_key(city, check_in, check_out, room_type, rooms_needed)
+        results = self.cache.get(key)
+        if results is not None:
+            self._count('hits')
+            return results
+
+        self._count('misses')
+        use_primary()
+        results = search()
+        self.cache.set(key, results, timeout=self.timeout)
+        return results
+
+    def _bump(self, keys: List[str]) -> None:
+        self.cache.set_many({key: uuid.uuid4().hex for key in keys}, timeout=0)
+        self._count('invalidations')
+
+    def invalidate_stay(self, city: str, check_in, check_out) -> None:
+        """Drop cached searches in `city` (and city-less searches) overlapping the stay."""
+        nights = _nights(check_in, check_out)
+        keys = []
+        for city_key in (_normalize_city(city), '*'):
+            keys.extend(f"v:night:{city_key}:{night.isoformat()}" for night in nights)
+        self._bump(keys)
+
+    def invalidate_booking(self, booking) -> None:
+        """Drop cached searches affected by a booking being created, paid or cancelled."""
+        self.invalidate_stay(booking.hotel.city, booking.check_in, booking.check_out)
+
+    def invalidate_city(self, city: str) -> None:
+        """Drop every cached search in `city` (and city-less searches), e.g. after an admin edit."""
+        self._bump([f"v:city:{_normalize_city(city)}", "v:city:*"])
+
+    def invalidate_cities(self, cities: Iterable[str]) -> None:
+        """invalidate_city for many cities at once, e.g. after a bulk import."""
+        keys = {f"v:city:{_normalize_city(city)}" for city in cities}
+        if keys:
+            self._bump(sorted(keys) + ["v:city:*"])
+
+    def _count(self, name: str) -> None:
+        key = f"stats:{name}"
+        backend = self.cache.cache
+        if isinstance(backend, RedisCache):
+            backend.inc(key)
+        else:
+            # The generic inc() would store the counter with the entry TTL
+            self.cache.set(key, (self.cache.get(key) or 0) + 1, timeout=0)
+
+    def stats(self) -> Dict:
+        hits, misses, invalidations = (
+            count or 0 for count in self.cache.get_many('stats:hits', 'stats:misses', 'stats:invalidations')
+        )
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'invalidations': invalidations
+        }
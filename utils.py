@@ -1,11 +1,11 @@
 from datetime import datetime, timedelta
 from models import Room, Booking, Hotel, User
 from typing import Tuple, List, Dict, Optional
+import pricing
 
 def check_peak_season(date: datetime) -> bool:
     """Check if given date falls in peak season."""
-    month = date.month
-    return month in [4, 5, 6, 7, 8, 11, 12]
+    return pricing.is_peak_season(date)
 
 def calculate_room_price(hotel: Hotel, room_type: str, check_in: datetime, 
                         check_out: datetime, num_guests: int) -> Tuple[float, float]:
@@ -14,8 +14,12 @@ def calculate_room_price(hotel: Hotel, room_type: str, check_in: datetime,
     Returns (base_price, total_price)
     """
     nights = (check_out - check_in).days
-    base_price = hotel.get_room_price(room_type, check_in, num_guests)
-    total_price = base_price * nights
+    room = Room.query.filter_by(hotel_id=hotel.id, type=room_type).first()
+    if room is None or nights <= 0:
+        return 0.0, 0.0
+    
+    total_price = pricing.stay_price(room.base_price, room.peak_price, check_in, check_out)
+    base_price = total_price / nights
     
     return base_price, total_price
 
@@ -24,31 +28,14 @@ def calculate_advance_booking_discount(check_in: datetime) -> Tuple[float, str]:
     Calculate advance booking discount percentage and reason.
     Returns (discount_percentage, discount_reason)
     """
-    days_in_advance = (check_in - datetime.now()).days
-    
-    if 80 <= days_in_advance <= 90:
-        return 0.30, "30% discount for booking 80-90 days in advance"
-    elif 60 <= days_in_advance <= 79:
-        return 0.20, "20% discount for booking 60-79 days in advance"
-    elif 45 <= days_in_advance <= 59:
-        return 0.10, "10% discount for booking 45-59 days in advance"
-    
-    return 0, "No advance booking discount applicable"
+    return pricing.advance_booking_discount(check_in)
 
 def calculate_cancellation_charge(booking: Booking) -> Tuple[float, str]:
     """
     Calculate cancellation charge and reason.
     Returns (charge_amount, charge_reason)
     """
-    days_until_checkin = (booking.check_in - datetime.now()).days
-    
-    if days_until_checkin > 60:
-        return 0, "No cancellation charge for cancellations over 60 days before check-in"
-    elif 30 <= days_until_checkin <= 60:
-        charge = booking.total_price * 0.5
-        return charge, "50% cancellation charge for cancellations 30-60 days before check-in"
-    else:
-        return booking.total_price, "100% cancellation charge for cancellations within 30 days of check-in"
+    return pricing.cancellation_charge(booking.total_price, booking.check_in)
 
 def find_available_rooms(hotel: Hotel, check_in: datetime, check_out: datetime, 
                         room_type: str, num_guests: int) -> List[Room]:
@@ -156,109 +143,37 @@ def get_room_availability_summary(hotel: Hotel, start_date: datetime,
 
 def get_dashboard_stats() -> Dict:
     """Get statistics for admin dashboard."""
-    from models import User, Hotel, Booking
-    from sqlalchemy import func
-    
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    from app import Booking
+    from dashboard_stats import compute_stats
     
-    stats = {
-        "total_users": User.query.count(),
-        "total_hotels": Hotel.query.count(),
-        "total_bookings": Booking.query.count(),
-        "active_bookings": Booking.query.filter(
-            Booking.check_out >= datetime.now(),
-            Booking.status == 'confirmed'
-        ).count(),
-        "monthly_revenue": db.session.query(
-            func.sum(Booking.total_price)
-        ).filter(
-            func.extract('month', Booking.booking_date) == current_month,
-            func.extract('year', Booking.booking_date) == current_year,
-            Booking.status == 'confirmed'
-        ).scalar() or 0,
-        "recent_bookings": Booking.query.order_by(
-            Booking.booking_date.desc()
-        ).limit(5).all()
-    }
+    stats = compute_stats()
+    stats["recent_bookings"] = Booking.query.order_by(
+        Booking.booking_date.desc()
+    ).limit(5).all()
     
     return stats
 
 def get_hotel_performance(hotel_id: int, start_date: Optional[datetime] = None, 
                          end_date: Optional[datetime] = None) -> Dict:
     """Get hotel performance metrics for the specified period."""
-    from models import Booking
-    from sqlalchemy import func
+    from performance import hotel_performance, performance_for
     
-    if not start_date:
-        start_date = datetime.now() - timedelta(days=30)
-    if not end_date:
-        end_date = datetime.now()
-    
-    bookings = Booking.query.filter(
-        Booking.hotel_id == hotel_id,
-        Booking.booking_date.between(start_date, end_date),
-        Booking.status == 'confirmed'
-    )
-    
-    total_revenue = db.session.query(
-        func.sum(Booking.total_price)
-    ).filter(
-        Booking.hotel_id == hotel_id,
-        Booking.booking_date.between(start_date, end_date),
-        Booking.status == 'confirmed'
-    ).scalar() or 0
-    
-    metrics = {
-        "total_bookings": bookings.count(),
-        "total_revenue": total_revenue,
-        "average_booking_value": total_revenue / bookings.count() if bookings.count() > 0 else 0,
-        "occupancy_rate": calculate_occupancy_rate(hotel_id, start_date, end_date),
-        "cancellation_rate": calculate_cancellation_rate(hotel_id, start_date, end_date)
-    }
-    
-    return metrics
+    metrics = performance_for(hotel_performance([hotel_id], start_date, end_date), hotel_id) or {}
+    return {key: metrics.get(key, 0) for key in (
+        "total_bookings", "total_revenue", "average_booking_value", "occupancy_rate", "cancellation_rate")}
 
 def calculate_occupancy_rate(hotel_id: int, start_date: datetime, end_date: datetime) -> float:
     """Calculate hotel occupancy rate for the specified period."""
-    from models import Hotel, Booking
+    from occupancy import occupancy
     
-    hotel = Hotel.query.get(hotel_id)
-    if not hotel:
-        return 0.0
-    
-    total_room_days = hotel.total_capacity * (end_date - start_date).days
-    
-    booked_room_days = db.session.query(
-        func.sum(
-            func.julianday(func.min(end_date, Booking.check_out)) - 
-            func.julianday(func.max(start_date, Booking.check_in))
-        )
-    ).filter(
-        Booking.hotel_id == hotel_id,
-        Booking.status == 'confirmed',
-        Booking.check_in < end_date,
-        Booking.check_out > start_date
-    ).scalar() or 0
-    
-    return (booked_room_days / total_room_days) * 100 if total_room_days > 0 else 0
+    return occupancy([hotel_id], start_date, end_date)[hotel_id].occupancy_rate
 
 def calculate_cancellation_rate(hotel_id: int, start_date: datetime, end_date: datetime) -> float:
     """Calculate hotel booking cancellation rate for the specified period."""
-    from models import Booking
-    
-    total_bookings = Booking.query.filter(
-        Booking.hotel_id == hotel_id,
-        Booking.booking_date.between(start_date, end_date)
-    ).count()
-    
-    cancelled_bookings = Booking.query.filter(
-        Booking.hotel_id == hotel_id,
-        Booking.booking_date.between(start_date, end_date),
-        Booking.status == 'cancelled'
-    ).count()
+    from performance import hotel_performance, performance_for
     
-    return (cancelled_bookings / total_bookings) * 100 if total_bookings > 0 else 0
+    metrics = performance_for(hotel_performance([hotel_id], start_date, end_date), hotel_id)
+    return metrics["cancellation_rate"] if metrics else 0
 
 def generate_monthly_report(month: int, year: int) -> Dict:
     """Generate monthly report with key metrics."""